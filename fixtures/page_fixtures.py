@@ -1,13 +1,363 @@
 """Pytest fixtures for page objects."""
 
+import os
+from collections.abc import Generator
+from pathlib import Path
+
 import pytest
-from playwright.sync_api import Page
+from playwright.sync_api import Browser, Page
 
+from pages.base_page import BasePage
 from pages.bmi_page import BMIPage
+from utils.batch_pages import BatchPages
+from utils.context_pool import ContextPool
+from utils.network_cache import MODES, NetworkCache
+from utils.report_model import ARTIFACTS_PROPERTY
+from utils.storage_state import StorageStateCache
+from utils.trace_capture import MODES as CAPTURE_MODES
+from utils.trace_capture import TraceCapture, artifact_name
+
+# Directory for the storage state snapshots of each worker
+STORAGE_STATE_DIR = Path(".playtest") / "storage_state"
+
+# Directory of the captured traces in the output directory of pytest-playwright
+TRACE_DIR = "traces"
+
+# Number of cases sharing a page when a batched marker has no size
+DEFAULT_BATCH_SIZE = 10
+
+# Stash key for the test, batch, position in the batch and batch size of a case
+BATCH_KEY = pytest.StashKey[tuple[str, int, int, int]]()
+
+# Stash key for the test run after a batched case, or None if it is the last test
+NEXT_ITEM_KEY = pytest.StashKey[pytest.Item | None]()
+
+
+# Hooks
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add a command line option."""
+    parser.addoption(
+        "--context-pool",
+        action="store",
+        type=int,
+        metavar="size",
+        default=0,
+        help="Reuse up to size warm browser contexts per worker instead of "
+        "creating a new context for every test. 0 disables the pool.",
+    )
+    parser.addoption(
+        "--storage-state-ttl",
+        action="store",
+        type=float,
+        metavar="seconds",
+        default=0,
+        help="Capture the browser storage state after a page object's prime step "
+        "once per worker and reuse it for this many seconds. 0 disables the cache.",
+    )
+    parser.addoption(
+        "--storage-state-refresh",
+        action="store_true",
+        default=False,
+        help="Discard cached storage state snapshots at the start of the session.",
+    )
+    parser.addoption(
+        "--network-mode",
+        action="store",
+        choices=MODES,
+        default="off",
+        help="Record responses to the network store, replay them offline from it, "
+        "or only block the listed resource types and domains.",
+    )
+    parser.addoption(
+        "--network-store",
+        action="store",
+        metavar="path",
+        default=str(Path(".playtest") / "network"),
+        help="Path to the store of recorded network responses.",
+    )
+    parser.addoption(
+        "--network-block-type",
+        action="append",
+        metavar="type",
+        default=None,
+        help="Resource type to block, e.g. font, image or media. Can be repeated.",
+    )
+    parser.addoption(
+        "--network-block-domain",
+        action="append",
+        metavar="domain",
+        default=None,
+        help="Domain, including its subdomains, to block. Can be repeated.",
+    )
+    parser.addoption(
+        "--playtest-capture",
+        action="store",
+        choices=CAPTURE_MODES,
+        default="off",
+        help="Record a Playwright trace of every test, only of the first retry of "
+        "failed tests, of every test keeping only failures, or of a sample of tests.",
+    )
+    parser.addoption(
+        "--playtest-capture-sample",
+        action="store",
+        type=float,
+        metavar="percent",
+        default=10,
+        help="Percentage of tests traced when the capture mode is sampled.",
+    )
+    parser.addoption(
+        "--playtest-capture-budget",
+        action="store",
+        type=float,
+        metavar="MB",
+        default=0,
+        help="Delete the oldest traces of the run once they use more than this many "
+        "megabytes. 0 keeps every trace.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the batched marker."""
+    config.addinivalue_line(
+        "markers",
+        "batched(size): run the parametrized cases of a test in batches of size, "
+        "sharing one loaded page between the cases of each batch",
+    )
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """Split the selected cases of each batched test into batches."""
+    positions: dict[str, int] = {}
+    for item in items:
+        marker = item.get_closest_marker("batched")
+        if marker is None or not hasattr(item, "callspec"):
+            continue
+
+        size = marker.kwargs.get("size", marker.args[0] if marker.args else None)
+        size = size or DEFAULT_BATCH_SIZE
+        # Each browser a test runs on has its own batch pages
+        browser = item.callspec.params.get("browser_name", "")
+        test = f"{item.path}::{item.originalname}[{browser}]"
+        position = positions[test] = positions.get(test, -1) + 1
+        item.stash[BATCH_KEY] = (test, position // size, position % size, size)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(
+    item: pytest.Item, nextitem: pytest.Item | None
+) -> Generator[None, None, None]:
+    """Keep the next test on a batched case, so the batch page closes after it."""
+    if BATCH_KEY in item.stash:
+        item.stash[NEXT_ITEM_KEY] = nextitem
+    yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item: pytest.Item) -> Generator[None, None, None]:
+    """Keep the report of each test phase on the item for use in fixtures."""
+    outcome = yield
+    report: pytest.TestReport = outcome.get_result()
+    # A rerun whose setup fails has no call report, so the last attempt's is dropped
+    if report.when == "setup":
+        item.rep_call = None
+    setattr(item, f"rep_{report.when}", report)
+
+
+# Browser fixtures
+@pytest.fixture(scope="session")
+def context_pool(
+    pytestconfig: pytest.Config, browser: Browser, browser_context_args: dict
+) -> Generator[ContextPool, None, None]:
+    """Pytest fixture for the pool of warm browser contexts of this worker."""
+    pool = ContextPool(
+        browser=browser,
+        context_args=browser_context_args,
+        size=pytestconfig.option.context_pool,
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="session")
+def storage_state_cache(pytestconfig: pytest.Config) -> StorageStateCache:
+    """Pytest fixture for the storage state snapshots of this worker."""
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    cache = StorageStateCache(
+        directory=STORAGE_STATE_DIR / worker,
+        ttl=pytestconfig.option.storage_state_ttl,
+    )
+    if pytestconfig.option.storage_state_refresh:
+        cache.invalidate()
+    return cache
+
+
+@pytest.fixture(scope="session")
+def batch_pages(
+    browser: Browser, browser_context_args: dict
+) -> Generator[BatchPages, None, None]:
+    """Pytest fixture for the pages shared by the cases of batched tests."""
+    pages = BatchPages(browser=browser, context_args=browser_context_args)
+    yield pages
+    pages.close()
+
+
+@pytest.fixture(scope="session")
+def trace_capture(pytestconfig: pytest.Config) -> TraceCapture:
+    """Pytest fixture for the capture of traces by the capture policy."""
+    return TraceCapture(
+        mode=pytestconfig.option.playtest_capture,
+        directory=Path(pytestconfig.option.output) / TRACE_DIR,
+        sample=pytestconfig.option.playtest_capture_sample,
+        budget=int(pytestconfig.option.playtest_capture_budget * 1024**2),
+    )
+
+
+@pytest.fixture()
+def playtest_page(
+    request: pytest.FixtureRequest, browser_name: str
+) -> Generator[Page, None, None]:
+    """Pytest fixture for a page, taken from the context pool when it is enabled.
+
+    The cases of a batched test share the page of their batch instead. browser_name
+    is requested so pytest-playwright parametrizes the test for every --browser, as
+    the browser fixtures below are only requested dynamically.
+    """
+    batch = request.node.stash.get(BATCH_KEY, None)
+    if batch is not None:
+        test, index, position, _ = batch
+        request.node.user_properties.append(("batch", index))
+        request.node.user_properties.append(("batch_position", position))
+
+        pages: BatchPages = request.getfixturevalue("batch_pages")
+        yield pages.get(test=test, batch=index)
+
+        # A failed case can leave the page in any state, so the rest of its batch
+        # continues on a new page
+        report = getattr(request.node, "rep_call", None)
+        if report is None or not report.passed:
+            pages.evict(test)
+            return
+
+        # Close the page after the last case of the batch run here, which is often
+        # short of the batch size for the last batch or when split between workers
+        nextitem = request.node.stash.get(NEXT_ITEM_KEY, None)
+        next_batch = nextitem.stash.get(BATCH_KEY, None) if nextitem else None
+        if next_batch is None or next_batch[:2] != (test, index):
+            pages.evict(test)
+        return
+
+    if not request.config.option.context_pool:
+        yield request.getfixturevalue("page")
+        return
+
+    pool: ContextPool = request.getfixturevalue("context_pool")
+    page = pool.acquire()
+    yield page
+
+    # A failed test can leave the page in any state, so it is not reused
+    report = getattr(request.node, "rep_call", None)
+    pool.release(page, healthy=report is not None and report.passed)
+
+
+def network_cache(config: pytest.Config, page_cls: type[BasePage]) -> NetworkCache:
+    """Create the network layer for a page object from the options and its overrides.
+
+    Page objects can set NETWORK_MODE to override the mode, and BLOCK_RESOURCE_TYPES
+    and BLOCK_DOMAINS to block more than the configured resource types and domains.
+    """
+    return NetworkCache(
+        mode=page_cls.NETWORK_MODE or config.option.network_mode,
+        store=Path(config.option.network_store),
+        block_resource_types=[
+            *(config.option.network_block_type or []),
+            *page_cls.BLOCK_RESOURCE_TYPES,
+        ],
+        block_domains=[
+            *(config.option.network_block_domain or []),
+            *page_cls.BLOCK_DOMAINS,
+        ],
+    )
+
+
+def capture_trace(request: pytest.FixtureRequest, page: Page) -> None:
+    """Record a trace of a test on a page when the capture policy selects the test.
+
+    The path of a kept trace is added to the user properties of the test, so it is
+    recorded in the report of its teardown.
+    """
+    if request.config.option.playtest_capture == "off":
+        return
+
+    capture: TraceCapture = request.getfixturevalue("trace_capture")
+    # pytest-rerunfailures counts the attempts of a test from 1
+    attempt = getattr(request.node, "execution_count", 1) - 1
+    if not capture.selects(attempt) or not capture.start(page, request.node.nodeid):
+        return
+
+    def stop() -> None:
+        report = getattr(request.node, "rep_call", None)
+        path = capture.stop(
+            page=page,
+            name=artifact_name(request.node.nodeid, attempt),
+            failed=report is None or report.failed,
+        )
+        if path is not None:
+            request.node.user_properties.append((ARTIFACTS_PROPERTY, [str(path)]))
+
+    request.addfinalizer(stop)
+
+
+def page_object(
+    request: pytest.FixtureRequest, page_cls: type[BasePage], page: Page
+) -> BasePage:
+    """Create a page object with its network layer and cached primed storage state.
+
+    When the storage state cache is enabled the page object's prime step is run in a
+    separate context the first time, or once the snapshot has expired, and the
+    captured storage state is applied to the page so later tests skip the prime step.
+    """
+    network = network_cache(config=request.config, page_cls=page_cls)
+    network.attach(page)
+    capture_trace(request=request, page=page)
+
+    # A batched case skips loading the page an earlier case in its batch loaded
+    batched = request.node.stash.get(BATCH_KEY, None) is not None
+    loaded = batched and page.url == page_cls.URL
+
+    if not request.config.option.storage_state_ttl:
+        return page_cls(page, loaded=loaded)
+
+    cache: StorageStateCache = request.getfixturevalue("storage_state_cache")
+    key = page_cls.__name__
+
+    def prime() -> dict:
+        browser: Browser = request.getfixturevalue("browser")
+        context_args: dict = request.getfixturevalue("browser_context_args")
+        context = browser.new_context(**context_args)
+        try:
+            prime_page = context.new_page()
+            network.attach(prime_page)
+            page_cls(prime_page).load()
+            return context.storage_state()
+        finally:
+            context.close()
+
+    cache.apply(context=page.context, state=cache.get_or_prime(key=key, prime=prime))
+
+    # Drop the snapshot if the test fails, in case a stale state was the cause
+    def invalidate_on_failure() -> None:
+        report = getattr(request.node, "rep_call", None)
+        if report is not None and report.failed:
+            cache.invalidate(key)
+
+    request.addfinalizer(invalidate_on_failure)
+
+    return page_cls(page, primed=True, loaded=loaded)
 
 
 # Page fixtures
 @pytest.fixture()
-def bmi_page(page: Page) -> BMIPage:
+def bmi_page(request: pytest.FixtureRequest, playtest_page: Page) -> BMIPage:
     """Pytest fixture to create instance of the BMIPage class."""
-    return BMIPage(page)
+    return page_object(request=request, page_cls=BMIPage, page=playtest_page)
@@ -2,10 +2,9 @@
 
 from datetime import datetime
 
-import pytest
-
 from utils.cli_args import generate_cli_args
 from utils.load_config import load_yaml_config
+from utils.runner_daemon import run_pytest
 
 if __name__ == "__main__":
     config = load_yaml_config()
@@ -13,4 +12,5 @@ if __name__ == "__main__":
 
     cli_args = generate_cli_args(config=config, path=path_timestamp)
 
-    pytest.main(args=cli_args)
+    # Runs are forked from the runner daemon when it is running
+    run_pytest(args=cli_args)
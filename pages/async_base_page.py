@@ -0,0 +1,34 @@
+"""File for defining the base class for async page objects."""
+
+from playwright.async_api import Locator, Page
+
+
+class AsyncBasePage:
+    """Base class for page objects driven with Playwright's async API.
+
+    Locators are declared as class attributes with the by_* functions of
+    pages.base_page, which build them from the async page on first access.
+    """
+
+    __slots__ = ("page", "primed", "_locators")
+
+    URL: str = ""
+
+    # Event goto waits for in load: domcontentloaded, load, networkidle or commit
+    WAIT_UNTIL: str = "load"
+
+    def __init__(self, page: Page, primed: bool = False) -> None:
+        """Initialise the page object with its page."""
+        self.page: Page = page
+        self.primed: bool = primed
+        self._locators: dict[str, Locator] = {}
+
+    async def load(self, wait_until: str | None = None) -> None:
+        """Load the website, priming it first if the browser state is not primed."""
+        await self.page.goto(self.URL, wait_until=wait_until or self.WAIT_UNTIL)
+        if not self.primed:
+            await self.prime()
+
+    async def prime(self) -> None:
+        """Bring a new browser state to where tests start, e.g. accept cookies."""
+        self.primed = True
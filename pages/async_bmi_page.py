@@ -0,0 +1,44 @@
+"""File for defining the async class for the BMI page."""
+
+from pages.async_base_page import AsyncBasePage
+from pages.base_page import by_role, by_selector
+
+
+class AsyncBMIPage(AsyncBasePage):
+    """Class to represent the BMI page with Playwright's async API."""
+
+    __slots__ = ()
+
+    URL: str = "https://patient.info/doctor/bmi-calculator-calculator"
+
+    cookies_agree_btn = by_role("button", name="AGREE")
+    metric_radio_btn = by_role("radio", name="Metric")
+    height_options = by_role("combobox")
+    height_option_cm: str = "centimetres"
+    height_input = by_role("textbox", name="Height")
+    weight_input = by_role("textbox", name="Weight")
+    calculate_btn = by_role("button", name="Calculate")
+    bmi_result = by_selector(".bmi-result")
+
+    async def prime(self) -> None:
+        """Accept the cookies, which only needs doing once per browser state."""
+        await self.cookies_agree_btn.click()
+        self.primed = True
+
+    async def select_metric(self) -> None:
+        """Check the metric radio button."""
+        await self.metric_radio_btn.check()
+
+    async def select_metric_cm(self) -> None:
+        """Check the metric radio button and select the centimetres option."""
+        await self.metric_radio_btn.check()
+        await self.height_options.select_option(self.height_option_cm)
+
+    async def input_height_weight(self, height: str, weight: str) -> None:
+        """Input the height and weight values."""
+        await self.height_input.fill(height)
+        await self.weight_input.fill(weight)
+
+    async def calculate_bmi(self) -> None:
+        """Click the calculate button."""
+        await self.calculate_btn.click()
@@ -0,0 +1,103 @@
+"""File for defining the base class and locator descriptors for page objects."""
+
+from playwright.sync_api import Locator, Page
+
+
+class LocatorDescriptor:
+    """Declarative locator of a page object, resolved on first access.
+
+    The locator is built by calling a method of the page object's page with the
+    given arguments the first time it is accessed, then cached on the instance, so
+    a test only builds the locators it uses.
+    """
+
+    def __init__(self, method: str, *args: object, **kwargs: object) -> None:
+        """Initialise the descriptor with the page method and its arguments."""
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.name = method
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Keep the attribute name, used as the cache key."""
+        self.name = name
+
+    def __get__(self, instance: object, owner: type) -> "Locator | LocatorDescriptor":
+        """Get the cached locator of the instance, building it if needed."""
+        if instance is None:
+            return self
+
+        locators: dict = instance._locators
+        if self.name not in locators:
+            method = getattr(instance.page, self.method)
+            locators[self.name] = method(*self.args, **self.kwargs)
+        return locators[self.name]
+
+
+def by_role(role: str, **kwargs: object) -> LocatorDescriptor:
+    """Declare a locator by ARIA role, accessible name and other role options."""
+    return LocatorDescriptor("get_by_role", role, **kwargs)
+
+
+def by_label(text: str, **kwargs: object) -> LocatorDescriptor:
+    """Declare a locator by the text of its label."""
+    return LocatorDescriptor("get_by_label", text, **kwargs)
+
+
+def by_text(text: str, **kwargs: object) -> LocatorDescriptor:
+    """Declare a locator by its text."""
+    return LocatorDescriptor("get_by_text", text, **kwargs)
+
+
+def by_test_id(test_id: str) -> LocatorDescriptor:
+    """Declare a locator by its test id attribute."""
+    return LocatorDescriptor("get_by_test_id", test_id)
+
+
+def by_selector(selector: str, **kwargs: object) -> LocatorDescriptor:
+    """Declare a locator by a css or xpath selector."""
+    return LocatorDescriptor("locator", selector, **kwargs)
+
+
+class BasePage:
+    """Base class for page objects.
+
+    Subclasses set the URL and declare their locators as class attributes with the
+    by_* functions, and define __slots__ = () to keep instances without a __dict__.
+    The network attributes override the network cache options for the page object.
+    """
+
+    __slots__ = ("page", "primed", "loaded", "_locators")
+
+    URL: str = ""
+
+    # Event goto waits for in load: domcontentloaded, load, networkidle or commit
+    WAIT_UNTIL: str = "load"
+
+    # Network cache mode, and resource types and domains blocked for the page object
+    NETWORK_MODE: str | None = None
+    BLOCK_RESOURCE_TYPES: tuple[str, ...] = ()
+    BLOCK_DOMAINS: tuple[str, ...] = ()
+
+    def __init__(self, page: Page, primed: bool = False, loaded: bool = False) -> None:
+        """Initialise the page object with its page."""
+        self.page: Page = page
+        self.primed: bool = primed
+        self.loaded: bool = loaded
+        self._locators: dict[str, Locator] = {}
+
+    def load(self, wait_until: str | None = None) -> None:
+        """Load the website, priming it first if the browser state is not primed."""
+        # A page already loaded for the page object, e.g. by an earlier case of a
+        # batch, is used as it is the first time only
+        if self.loaded:
+            self.loaded = False
+            return
+
+        self.page.goto(self.URL, wait_until=wait_until or self.WAIT_UNTIL)
+        if not self.primed:
+            self.prime()
+
+    def prime(self) -> None:
+        """Bring a new browser state to where tests start, e.g. accept cookies."""
+        self.primed = True
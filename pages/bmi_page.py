@@ -1,30 +1,28 @@
 """File for defining the class for the BMI page."""
 
+from pages.base_page import BasePage, by_role, by_selector
 
-from playwright.sync_api import Locator, Page
 
-
-class BMIPage:
+class BMIPage(BasePage):
     """Class to represent the BMI page."""
 
+    __slots__ = ()
+
     URL: str = "https://patient.info/doctor/bmi-calculator-calculator"
 
-    def __init__(self, page: Page) -> None:
-        """Initialise the page object and it's defined locators."""
-        self.page: Page = page
-        self.cookies_agree_btn: Locator = page.get_by_role("button", name="AGREE")
-        self.metric_radio_btn: Locator = page.get_by_role("radio", name="Metric")
-        self.height_options: Locator = page.get_by_role("combobox")
-        self.height_option_cm: Locator = "centimetres"
-        self.height_input: Locator = page.get_by_role("textbox", name="Height")
-        self.weight_input: Locator = page.get_by_role("textbox", name="Weight")
-        self.calculate_btn: Locator = page.get_by_role("button", name="Calculate")
-        self.bmi_result: Locator = page.locator(".bmi-result")
-
-    def load(self) -> None:
-        """Load the website."""
-        self.page.goto(self.URL)
+    cookies_agree_btn = by_role("button", name="AGREE")
+    metric_radio_btn = by_role("radio", name="Metric")
+    height_options = by_role("combobox")
+    height_option_cm: str = "centimetres"
+    height_input = by_role("textbox", name="Height")
+    weight_input = by_role("textbox", name="Weight")
+    calculate_btn = by_role("button", name="Calculate")
+    bmi_result = by_selector(".bmi-result")
+
+    def prime(self) -> None:
+        """Accept the cookies, which only needs doing once per browser state."""
         self.cookies_agree_btn.click()
+        self.primed = True
 
     def select_metric(self) -> None:
         """Check the metric radio button."""
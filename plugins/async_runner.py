@@ -0,0 +1,233 @@
+"""Plugin for running async page object tests concurrently on one event loop."""
+
+import asyncio
+import inspect
+import time
+import typing
+from functools import partial
+
+import pytest
+from _pytest.skipping import evaluate_skip_marks, evaluate_xfail_marks, xfailed_key
+from playwright.async_api import Browser, BrowserContext, Page, async_playwright
+
+from pages.async_base_page import AsyncBasePage
+
+# Errors raised by a test, including pytest's fail and skip outcomes
+TEST_ERRORS = (Exception, pytest.fail.Exception, pytest.skip.Exception)
+
+
+# Hooks
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add a command line option."""
+    parser.addoption(
+        "--async-concurrency",
+        action="store",
+        type=int,
+        metavar="n",
+        default=0,
+        help="Run async tests concurrently on one event loop, at most n at a time. "
+        "0 skips async tests.",
+    )
+
+
+def is_async(item: pytest.Item) -> bool:
+    """Check if a test is an async test function."""
+    return isinstance(item, pytest.Function) and inspect.iscoroutinefunction(item.obj)
+
+
+def async_enabled(config: pytest.Config) -> bool:
+    """Check if async tests are run in this session."""
+    # xdist workers run one test at a time, so async tests only run in serial runs
+    return (
+        config.option.async_concurrency > 0
+        and not hasattr(config, "workerinput")
+        and not getattr(config.option, "numprocesses", None)
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    """Skip async tests when they are not run by the async runner."""
+    if async_enabled(config):
+        return
+
+    skip = pytest.mark.skip(reason="async tests run with --async-concurrency")
+    for item in items:
+        if is_async(item):
+            item.add_marker(skip)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session: pytest.Session) -> bool | None:
+    """Run the async tests concurrently, followed by the other tests one at a time."""
+    config = session.config
+    if not async_enabled(config) or config.option.collectonly or session.testsfailed:
+        return None
+
+    async_items = [item for item in session.items if is_async(item)]
+    if not async_items:
+        return None
+
+    runner = AsyncRunner(config=config, concurrency=config.option.async_concurrency)
+    asyncio.run(runner.run(async_items))
+
+    sync_items = [item for item in session.items if not is_async(item)]
+    for i, item in enumerate(sync_items):
+        if session.shouldfail:
+            raise session.Failed(session.shouldfail)
+        if session.shouldstop:
+            raise session.Interrupted(session.shouldstop)
+
+        nextitem = sync_items[i + 1] if i + 1 < len(sync_items) else None
+        item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+
+    if session.shouldfail:
+        raise session.Failed(session.shouldfail)
+    return True
+
+
+def _reraise(error: BaseException | None) -> None:
+    """Raise the error of a test phase, if it had one."""
+    if error is not None:
+        raise error
+
+
+def evaluate_marks(item: pytest.Item) -> None:
+    """Skip or xfail a test by its markers, as pytest does in the setup of a test."""
+    skipped = evaluate_skip_marks(item)
+    if skipped:
+        raise pytest.skip.Exception(skipped.reason, _use_item_location=True)
+
+    # The xfail evaluation is kept for pytest to turn the call report into an xfail
+    item.stash[xfailed_key] = xfailed = evaluate_xfail_marks(item)
+    if xfailed and not item.config.option.runxfail and not xfailed.run:
+        pytest.xfail("[NOTRUN] " + xfailed.reason)
+
+
+class AsyncRunner:
+    """Runner for async tests on one event loop with a concurrency limit.
+
+    Each test gets a new browser context, and its arguments are filled from its
+    parameters and by creating the async page objects it is annotated with. The
+    setup, call and teardown of each test are reported through pytest's hooks, so
+    the results reach the terminal and the playtest report like any other test.
+    """
+
+    def __init__(self, config: pytest.Config, concurrency: int) -> None:
+        """Initialise the runner with the pytest config and concurrency limit."""
+        self._config = config
+        self._concurrency = concurrency
+
+    async def run(self, items: list[pytest.Function]) -> None:
+        """Run the async tests in a shared browser."""
+        # Tests skipped by their markers are reported without starting a browser
+        runnable = []
+        for item in items:
+            start = time.time()
+            try:
+                evaluate_marks(item)
+                runnable.append(item)
+            except TEST_ERRORS as e:
+                stop = time.time()
+                self._report(
+                    item, [("setup", start, stop, e), ("teardown", stop, stop, None)]
+                )
+        if not runnable:
+            return
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        browser_name = (self._config.getoption("browser", None) or ["chromium"])[0]
+        headed = self._config.getoption("headed", False)
+
+        async with async_playwright() as playwright:
+            browser_type = getattr(playwright, browser_name)
+            start = time.time()
+            try:
+                browser = await browser_type.launch(headless=not headed)
+            except Exception as e:
+                # Without a browser every test errors in its setup
+                for item in runnable:
+                    self._report(item, [("setup", start, time.time(), e)])
+                return
+
+            try:
+                await asyncio.gather(
+                    *(self._run_item(browser, item, semaphore) for item in runnable)
+                )
+            finally:
+                await browser.close()
+
+    async def _arguments(self, item: pytest.Function, context: BrowserContext) -> dict:
+        """Get the arguments of a test from its parameters and async page objects."""
+        params = dict(item.callspec.params) if hasattr(item, "callspec") else {}
+        hints = typing.get_type_hints(item.obj)
+
+        # Every page object of a test shares one page
+        page: Page | None = None
+        kwargs = {}
+        for name in inspect.signature(item.obj).parameters:
+            hint = hints.get(name)
+            if name in params:
+                kwargs[name] = params[name]
+            elif isinstance(hint, type) and issubclass(hint, AsyncBasePage):
+                page = page or await context.new_page()
+                kwargs[name] = hint(page)
+            else:
+                raise LookupError(
+                    f"Async test argument {name} is not a parameter or page object"
+                )
+        return kwargs
+
+    async def _run_item(
+        self, browser: Browser, item: pytest.Function, semaphore: asyncio.Semaphore
+    ) -> None:
+        """Run the setup, call and teardown of a test and report them."""
+        async with semaphore:
+            session = item.session
+            if session.shouldfail or session.shouldstop:
+                return
+
+            phases: list[tuple[str, float, float, BaseException | None]] = []
+            context: BrowserContext | None = None
+            kwargs: dict | None = None
+
+            start = time.time()
+            try:
+                context = await browser.new_context()
+                kwargs = await self._arguments(item, context)
+                phases.append(("setup", start, time.time(), None))
+            except Exception as e:
+                phases.append(("setup", start, time.time(), e))
+
+            if kwargs is not None:
+                start = time.time()
+                try:
+                    await item.obj(**kwargs)
+                    phases.append(("call", start, time.time(), None))
+                except TEST_ERRORS as e:
+                    phases.append(("call", start, time.time(), e))
+
+            start = time.time()
+            try:
+                if context is not None:
+                    await context.close()
+                phases.append(("teardown", start, time.time(), None))
+            except Exception as e:
+                phases.append(("teardown", start, time.time(), e))
+
+        self._report(item, phases)
+
+    def _report(
+        self,
+        item: pytest.Function,
+        phases: list[tuple[str, float, float, BaseException | None]],
+    ) -> None:
+        """Report each phase of a finished test through pytest's hooks."""
+        item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        for when, start, stop, error in phases:
+            call = pytest.CallInfo.from_call(partial(_reraise, error), when=when)
+            report = item.ihook.pytest_runtest_makereport(item=item, call=call)
+            report.start, report.stop, report.duration = start, stop, stop - start
+            item.ihook.pytest_runtest_logreport(report=report)
+        item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
@@ -0,0 +1,159 @@
+"""Plugin for scheduling parallel tests by their historical durations."""
+
+import heapq
+import statistics
+from pathlib import Path
+
+import pytest
+from xdist.scheduler import LoadScheduling
+from xdist.workermanage import WorkerController
+
+# Number of recent runs used to estimate the duration of each test
+HISTORY_RUNS = 10
+
+
+# Hooks
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add a command line option."""
+    parser.addoption(
+        "--playtest-schedule",
+        action="store",
+        choices=["default", "duration"],
+        default="default",
+        help="Distribute parallel tests with xdist's default scheduling or by "
+        "historical durations, longest first.",
+    )
+    parser.addoption(
+        "--playtest-history",
+        action="store",
+        metavar="path",
+        default="reports",
+        help="Path to the reports directory holding the report catalog.",
+    )
+
+
+@pytest.hookimpl(tryfirst=True, optionalhook=True)
+def pytest_xdist_make_scheduler(
+    config: pytest.Config, log: object
+) -> LoadScheduling | None:
+    """Return a duration aware scheduler when there is a history of durations."""
+    if config.option.playtest_schedule != "duration":
+        return None
+
+    # Bin packing would discard the order of the failure first plugin
+    if getattr(config.option, "playtest_failure_first", False):
+        return None
+
+    durations = load_durations(reports_dir=Path(config.option.playtest_history))
+
+    # Without any history fall back to the default xdist scheduling
+    if not durations:
+        return None
+
+    return DurationScheduling(config=config, log=log, durations=durations)
+
+
+def load_durations(reports_dir: Path) -> dict[str, float]:
+    """Get the mean duration of each test over the most recent catalogued runs."""
+    # Imported here so pandas is only loaded when duration scheduling is used
+    from utils.report_catalog import CATALOG_FILE, ReportCatalog
+    from utils.report_history import HISTORY_FILE, mean_durations, update_history
+
+    if not (reports_dir / CATALOG_FILE).exists():
+        return {}
+
+    with ReportCatalog(path=reports_dir / CATALOG_FILE) as catalog:
+        runs = catalog.latest_runs(limit=HISTORY_RUNS)
+
+    history = update_history(history_path=reports_dir / HISTORY_FILE, runs=runs)
+    return mean_durations(history=history, runs=runs)
+
+
+def lpt_bins(
+    nodeids: list[str], durations: dict[str, float], bins: int
+) -> list[list[int]]:
+    """Assign test indices to bins by longest processing time first.
+
+    Tests are taken longest first and each is assigned to the bin with the lowest
+    total duration so far. Tests without a history are given the median duration.
+    """
+    default = statistics.median(durations.values()) if durations else 0.0
+    estimates = [durations.get(nodeid, default) for nodeid in nodeids]
+    order = sorted(range(len(nodeids)), key=lambda i: estimates[i], reverse=True)
+
+    assigned: list[list[int]] = [[] for _ in range(bins)]
+    loads = [(0.0, b) for b in range(bins)]
+    for index in order:
+        load, b = heapq.heappop(loads)
+        assigned[b].append(index)
+        heapq.heappush(loads, (load + estimates[index], b))
+
+    return assigned
+
+
+class DurationScheduling(LoadScheduling):
+    """Schedule tests across xdist workers by longest processing time first.
+
+    The collected tests are bin packed across the workers once the collection is
+    complete, using historical durations, and each worker runs its bin longest first.
+    Workers are kept until every test has run, so the tests of a crashed worker are
+    shared out between the others by xdist's load scheduling.
+    """
+
+    def __init__(
+        self, config: pytest.Config, log: object, durations: dict[str, float]
+    ) -> None:
+        """Initialise the scheduler with the historical test durations."""
+        super().__init__(config, log)
+        self._durations = durations
+
+    def schedule(self) -> None:
+        """Send each worker its bin of tests."""
+        assert self.collection_is_completed
+
+        # The initial distribution has already happened, e.g. a worker was replaced
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = list(self.node2collection.values())[0]
+        if not self.collection:
+            return
+
+        # Chunk size used by xdist's load scheduling to share out reassigned tests
+        if self.maxschedchunk is None:
+            self.maxschedchunk = len(self.collection)
+
+        bins = lpt_bins(
+            nodeids=self.collection, durations=self._durations, bins=len(self.nodes)
+        )
+        for node, indices in zip(self.nodes, bins, strict=True):
+            self._send_bin(node=node, indices=indices)
+
+        # Workers with fewer than two tests need a shutdown to run their last test
+        for node in self.nodes:
+            self.check_schedule(node)
+
+    def check_schedule(self, node: WorkerController, duration: float = 0) -> None:
+        """Send a worker reassigned tests, or shut it down once every test has run."""
+        if node.shutting_down:
+            return
+
+        # Only the tests of a crashed worker are pending after the bins are sent
+        if self.pending:
+            super().check_schedule(node, duration=duration)
+
+        # A worker holds back its last test until it is sent more or shut down
+        elif len(self.node2pending[node]) < 2:
+            node.shutdown()
+
+    def _send_bin(self, node: WorkerController, indices: list[int]) -> None:
+        """Send a bin of tests to a worker."""
+        if indices:
+            self.node2pending[node].extend(indices)
+            node.send_runtest_some(indices)
@@ -0,0 +1,69 @@
+"""Plugin for running historically failing and recently changed tests first."""
+
+from pathlib import Path
+
+import pytest
+
+from utils.report_catalog import recent_failures
+
+# Number of recent runs whose failing tests are run first
+HISTORY_RUNS = 10
+
+
+# Hooks
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add a command line option."""
+    parser.addoption(
+        "--playtest-failure-first",
+        action="store_true",
+        default=False,
+        help="Run the tests that failed or were rerun in recent catalogued runs "
+        "first, then the tests affected by changed files, then the rest.",
+    )
+    parser.addoption(
+        "--playtest-changed-since",
+        action="store",
+        metavar="revision",
+        default="HEAD",
+        help="Git revision to find the changed files of --playtest-failure-first.",
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    """Reorder the tests so failing and recently changed tests run first."""
+    if not config.option.playtest_failure_first:
+        return
+
+    # Imported here so the tests are only parsed when tests are reordered
+    from utils.test_impact import DependencyMap
+
+    failing = recent_failures(
+        reports_dir=Path(config.option.playtest_history), runs=HISTORY_RUNS
+    )
+    affected, _ = DependencyMap().select(
+        base=config.option.playtest_changed_since, record=False
+    )
+    items[:] = failure_first(items=items, failing=failing, affected=set(affected))
+
+
+def failure_first(
+    items: list[pytest.Item], failing: list[str], affected: set[str]
+) -> list[pytest.Item]:
+    """Order tests by their failures, then tests affected by changes, then the rest.
+
+    Failing tests keep the order of the catalog, most failures first, and the
+    other tests keep the order they were collected in.
+    """
+    ranks = {nodeid: rank for rank, nodeid in enumerate(failing)}
+
+    def key(item: pytest.Item) -> tuple[int, int]:
+        if item.nodeid in ranks:
+            return 0, ranks[item.nodeid]
+        # The dependency map has a single entry for every case of a parametrized test
+        if item.nodeid.partition("[")[0] in affected:
+            return 1, 0
+        return 2, 0
+
+    return sorted(items, key=key)
@@ -1,11 +1,52 @@
 """Class for implementing a json report plugin for Playtest."""
 
 import json
+import sys
+import time
+from collections.abc import Generator
+from contextlib import suppress
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pytest
 from _pytest.terminal import TerminalReporter
 
+from plugins.report_stream import (
+    NdjsonReportWriter,
+    export_json,
+    merge_shards,
+    read_ndjson,
+)
+from utils.report_catalog import CATALOG_FILE, ReportCatalog, result_counts
+from utils.report_model import FAILURE_CLASS_PROPERTY, INSTRUMENTATION_PROPERTY
+from utils.retry_policy import classify, failure_message
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
+SHARD_DIR = "shards"
+
+# Stash key for the wall and cpu time of each phase of a test
+TIMINGS_KEY = pytest.StashKey[dict[str, tuple[float, float]]]()
+
+# Stash key for the navigation timings of the page used by a test
+NAVIGATION_KEY = pytest.StashKey[dict]()
+
+# Script to get the load timings, request count and bytes transferred of a page
+NAVIGATION_TIMINGS = """
+() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    const resources = performance.getEntriesByType("resource");
+    const entries = nav ? [nav, ...resources] : resources;
+    return {
+        page_load: nav && nav.loadEventEnd ? nav.loadEventEnd / 1000 : null,
+        dom_content_loaded: nav ? nav.domContentLoadedEventEnd / 1000 : null,
+        requests: entries.length,
+        transfer_bytes: entries.reduce((total, e) => total + (e.transferSize || 0), 0),
+    };
+}
+"""
+
 
 # Hooks
 def pytest_addoption(parser: pytest.Parser) -> None:
@@ -17,15 +58,101 @@ def pytest_addoption(parser: pytest.Parser) -> None:
         default=None,
         help="Path to json report of test session events.",
     )
+    parser.addoption(
+        "--playtest-report-mode",
+        action="store",
+        choices=["json", "stream"],
+        default="json",
+        help="Write the report once at the end of the session (json) "
+        "or append each event to an ndjson file as it happens (stream).",
+    )
+    parser.addoption(
+        "--playtest-report-flush",
+        action="store",
+        type=int,
+        metavar="n",
+        default=100,
+        help="Number of streamed report events to buffer before flushing to disk.",
+    )
+    parser.addoption(
+        "--playtest-report-no-json",
+        action="store_true",
+        default=False,
+        help="Skip the compacted json export when streaming the report.",
+    )
+    parser.addoption(
+        "--playtest-report-shards",
+        action="store_true",
+        default=False,
+        help="Let each xdist worker write its own report shard, "
+        "merged by the controller at the end of the session.",
+    )
+    parser.addoption(
+        "--playtest-report-table",
+        action="store_true",
+        default=False,
+        help="Also write a columnar parquet summary of the report for fast loading.",
+    )
+    parser.addoption(
+        "--playtest-report-instrument",
+        action="store_true",
+        default=False,
+        help="Record the wall and cpu time, fixture and body time, peak memory and "
+        "browser navigation timings of each test in the report.",
+    )
+    parser.addoption(
+        "--playtest-report-no-catalog",
+        action="store_true",
+        default=False,
+        help="Skip recording the run in the report catalog of the parent directory.",
+    )
 
 
 def pytest_configure(config: pytest.Config) -> None:
     """Configure the playtest-report plugin."""
     playtest_report = config.option.playtest_report
+
+    # Tests are measured in the process running them, including xdist workers
+    if playtest_report and config.option.playtest_report_instrument:
+        config._playtest_instrument_plugin = PlaytestInstrumentPlugin()
+        config.pluginmanager.register(config._playtest_instrument_plugin)
+
     if playtest_report and not hasattr(config, "workerinput"):
         config._playtest_report_plugin = PlaytestReportPlugin(config, playtest_report)
         config.pluginmanager.register(config._playtest_report_plugin)
 
+    # xdist workers only write their own shard when sharded reports are enabled
+    elif playtest_report and config.option.playtest_report_shards:
+        config._playtest_shard_plugin = PlaytestShardPlugin(config, playtest_report)
+        config.pluginmanager.register(config._playtest_shard_plugin)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo
+) -> Generator[None, None, None]:
+    """Record the class of a failure, e.g. a timeout, in the report of its phase."""
+    outcome = yield
+    report: pytest.TestReport = outcome.get_result()
+
+    # The class is the reason a failure is retried by the smart retry policy
+    if report.failed and item.config.option.playtest_report:
+        message = failure_message(report.longrepr, excinfo=call.excinfo)
+        report.user_properties.append((FAILURE_CLASS_PROPERTY, classify(message)))
+
+
+def serialize_report(
+    config: pytest.Config, report: pytest.CollectReport | pytest.TestReport
+) -> dict:
+    """Return a json encodable dict of a collect or test report."""
+    data = config.hook.pytest_report_to_serializable(config=config, report=report)
+
+    # Remove the "node" item as it is not json encodable
+    if "node" in data:
+        data.pop("node")
+
+    return data
+
 
 class PlaytestReportPlugin:
     """Class containing logic for using pytest hooks to create a json report file."""
@@ -38,60 +165,328 @@ class PlaytestReportPlugin:
         self._collect_data: list = []
         self._test_data: list = []
         self._total_duration: float = 0
+        self._outcomes: dict[str, int] = {}
+        self._results: dict[str, dict] = {}
+        self._started: float = time.time()
 
         # Create the report path directory if it does not already exist
         Path(self._report_path).mkdir(parents=True, exist_ok=True)
 
+        # In stream mode every report is appended to an ndjson file as it arrives
+        self._writer: NdjsonReportWriter | None = None
+        if config.option.playtest_report_mode == "stream":
+            self._writer = NdjsonReportWriter(
+                path=Path(self._report_path) / "playtest_report.ndjson",
+                flush_every=config.option.playtest_report_flush,
+            )
+
+        # Reports from xdist workers are read from their shards at the end instead
+        self._shards: bool = config.option.playtest_report_shards
+
     def pytest_collectreport(self, report: pytest.CollectReport) -> None:
         """Get details of the tests that have been collected."""
-        data = self._config.hook.pytest_report_to_serializable(
-            config=self._config, report=report
-        )
-        self._collect_data.append(data)
+        # Worker collect reports are written to their shards and merged at the end
+        if self._shards and hasattr(report, "node"):
+            return
+
+        data = serialize_report(config=self._config, report=report)
+
+        if self._writer is not None:
+            self._writer.write(data)
+        else:
+            self._collect_data.append(data)
 
     def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
         """Get details of the tests that have been run."""
-        data = self._config.hook.pytest_report_to_serializable(
-            config=self._config, report=report
+        # xdist sets the "node" attribute on reports sent back from a worker
+        if self._shards and hasattr(report, "node"):
+            return
+
+        self._add_test_data(serialize_report(config=self._config, report=report))
+
+    def _add_test_data(self, data: dict) -> None:
+        """Store a serialized test report and update the running totals."""
+        # Keep running totals so the full list is never walked at the end
+        self._total_duration += data["duration"]
+        if data["when"] == "call":
+            outcome = data["outcome"]
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+
+        self._add_result(data)
+
+        if self._writer is not None:
+            self._writer.write(data)
+        else:
+            self._test_data.append(data)
+
+    def _add_result(self, data: dict) -> None:
+        """Update the final outcome, reruns and total duration of a test."""
+        result = self._results.setdefault(
+            data["nodeid"], {"outcome": "passed", "reruns": 0, "duration": 0.0}
         )
+        result["duration"] += data["duration"]
 
-        # Remove the "node" item as it is not json encodable
-        if "node" in data:
-            data.pop("node")
+        # Each rerun starts with a new setup phase, which decides the outcome again
+        if data["when"] == "setup" and data["outcome"] != "rerun":
+            result["outcome"] = "passed"
 
-        self._test_data.append(data)
+        if data["outcome"] == "rerun":
+            result["reruns"] += 1
+        elif data["outcome"] == "failed":
+            result["outcome"] = "failed" if data["when"] == "call" else "error"
+        elif data["outcome"] == "skipped":
+            result["outcome"] = "skipped"
 
     def pytest_sessionfinish(self, exitstatus: int) -> None:
         """Generate report at the end of the pytest session."""
         # Get the metadata for the report
         data = {
             "pytest_version": pytest.__version__,
-            "exitstatus": exitstatus,
+            "exitstatus": int(exitstatus),
             "args": self._config.invocation_params.args,
         }
         self._metadata.append(data)
 
-        # Calculate total duration of test execution
-        for x in self._test_data:
-            self._total_duration += x["duration"]
-        self._metadata.append({"total_duration": round(self._total_duration, 2)})
+        # Merge the worker shards into the report ahead of the totals
+        workers = self._merge_shards()
 
-        # Create a dict from all the lists of data
-        json_data = {
-            "metadata": self._metadata,
-            "collect_data": self._collect_data,
-            "test_data": self._test_data,
-        }
+        # Add the total duration of test execution and the outcome totals
+        self._metadata.append(
+            {"total_duration": round(self._total_duration, 2), **self._outcomes}
+        )
+        if workers:
+            self._metadata.append({"workers": workers})
 
         # Define the path to the json report file
         file_path = self._report_path + "/playtest_report.json"
 
-        # Dump the dictionary as json to the json file
-        with open(file_path, "w") as f:
-            json.dump(json_data, f)
+        if self._writer is not None:
+            # Close the stream with a trailer and optionally export compacted json
+            self._writer.close(trailer={"metadata": self._metadata})
+            if not self._config.option.playtest_report_no_json:
+                export_json(
+                    ndjson_path=self._writer.path,
+                    json_path=Path(file_path),
+                    metadata=self._metadata,
+                )
+        else:
+            # Create a dict from all the lists of data
+            json_data = {
+                "metadata": self._metadata,
+                "collect_data": self._collect_data,
+                "test_data": self._test_data,
+            }
+
+            # Dump the dictionary as json to the json file
+            with open(file_path, "w") as f:
+                json.dump(json_data, f)
+
+        if self._config.option.playtest_report_table:
+            self._write_summary_table()
+
+        if not self._config.option.playtest_report_no_catalog:
+            self._record_run(exitstatus=int(exitstatus))
+
+    def _record_run(self, exitstatus: int) -> None:
+        """Record the run in the report catalog of the parent directory."""
+        report_path = Path(self._report_path)
+        with ReportCatalog(path=report_path.parent / CATALOG_FILE) as catalog:
+            catalog.record_run(
+                path=report_path,
+                started=self._started,
+                finished=time.time(),
+                args=self._config.invocation_params.args,
+                counts=result_counts(results=self._results),
+                duration=round(self._total_duration, 2),
+                exitstatus=exitstatus,
+                results=self._results,
+            )
+
+    def _write_summary_table(self) -> None:
+        """Write the columnar summary table alongside the report."""
+        # Imported here so pyarrow is only loaded when the table is requested
+        from utils.report_table import SUMMARY_FILE, write_summary_table
+
+        if self._writer is not None:
+            test_data = (
+                record
+                for record in read_ndjson(self._writer.path)
+                if record.get("$report_type") == "TestReport"
+            )
+        else:
+            test_data = self._test_data
+
+        write_summary_table(
+            test_data=test_data,
+            path=Path(self._report_path) / SUMMARY_FILE,
+            metadata=self._metadata,
+        )
+
+    def _merge_shards(self) -> list[dict]:
+        """Stream the records of any xdist worker shards into the report."""
+        shard_dir = Path(self._report_path) / SHARD_DIR
+        if not self._shards or not shard_dir.is_dir():
+            return []
+
+        shard_paths = sorted(shard_dir.glob("*.ndjson"))
+        trailers: list[dict] = []
+        for record in merge_shards(shard_paths=shard_paths, trailers=trailers):
+            if record.get("$report_type") == "CollectReport":
+                if self._writer is not None:
+                    self._writer.write(record)
+                else:
+                    self._collect_data.append(record)
+            else:
+                self._add_test_data(record)
+
+        # The shards are no longer needed once merged into the report
+        for path in shard_paths:
+            path.unlink()
+        shard_dir.rmdir()
+
+        return [t["metadata"][0] for t in trailers]
 
     def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
         """Write details of the test report to the terminal."""
         terminalreporter.write_sep(
             "-", f"generated Playtest report file: {self._report_path}"
         )
+
+
+class PlaytestShardPlugin:
+    """Class for writing the reports of a single xdist worker to a shard file."""
+
+    def __init__(self, config: pytest.Config, report_path: str) -> None:
+        """Initialise the object with a shard file named after the worker."""
+        self._config = config
+        self._worker_id: str = config.workerinput["workerid"]
+        self._started = time.time()
+        self._total_duration: float = 0
+        self._outcomes: dict[str, int] = {}
+
+        shard_dir = Path(report_path) / SHARD_DIR
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        self._writer = NdjsonReportWriter(
+            path=shard_dir / f"playtest_report.{self._worker_id}.ndjson",
+            flush_every=config.option.playtest_report_flush,
+        )
+
+    def pytest_collectreport(self, report: pytest.CollectReport) -> None:
+        """Write details of the collected tests to the shard."""
+        # Every worker collects the same tests so only the first one records them
+        if self._worker_id == "gw0":
+            self._writer.write(serialize_report(config=self._config, report=report))
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        """Write details of a test that has run to the shard."""
+        data = serialize_report(config=self._config, report=report)
+        data["worker"] = self._worker_id
+
+        self._total_duration += data["duration"]
+        if data["when"] == "call":
+            outcome = data["outcome"]
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+
+        self._writer.write(data)
+
+    def pytest_sessionfinish(self) -> None:
+        """Close the shard with a trailer holding the worker id and timing."""
+        worker = {
+            "worker": self._worker_id,
+            "started": self._started,
+            "finished": time.time(),
+            "total_duration": round(self._total_duration, 2),
+            **self._outcomes,
+        }
+        self._writer.close(trailer={"metadata": [worker]})
+
+
+def peak_rss() -> int | None:
+    """Get the peak resident memory of this process in bytes, where supported.
+
+    This is the high-water mark of the process so far, not of a single test, so a
+    test only raises it when it uses more memory than every test before it.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Linux reports the peak in kilobytes and macOS in bytes
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def find_page(item: pytest.Item) -> "Page | None":
+    """Find the open page used by a test, directly or through a page object."""
+    # Imported here so Playwright is only loaded when tests are instrumented
+    from playwright.sync_api import Page
+
+    for value in getattr(item, "funcargs", {}).values():
+        page = value if isinstance(value, Page) else getattr(value, "page", None)
+        if isinstance(page, Page) and not page.is_closed():
+            return page
+    return None
+
+
+class PlaytestInstrumentPlugin:
+    """Class for recording the resource use and timings of each test.
+
+    The measurements are added to the user properties of the teardown report, so
+    they travel with the report from xdist workers into the Playtest report.
+    """
+
+    def _measure(self, item: pytest.Item, when: str) -> Generator[None, None, None]:
+        """Measure the wall and cpu time of a phase of a test."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield
+        timings = item.stash.setdefault(TIMINGS_KEY, {})
+        timings[when] = (time.perf_counter() - wall, time.process_time() - cpu)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item: pytest.Item) -> Generator[None, None, None]:
+        """Measure the setup of a test's fixtures."""
+        item.stash[TIMINGS_KEY] = {}
+        item.stash[NAVIGATION_KEY] = {}
+        yield from self._measure(item, "setup")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item) -> Generator[None, None, None]:
+        """Measure the body of a test and the navigation timings of its page."""
+        # Imported here so Playwright is only loaded when tests are instrumented
+        from playwright.sync_api import Error
+
+        yield from self._measure(item, "call")
+
+        # The page is read before teardown closes it
+        page = find_page(item)
+        if page is not None:
+            with suppress(Error):
+                item.stash[NAVIGATION_KEY] = page.evaluate(NAVIGATION_TIMINGS)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item: pytest.Item) -> Generator[None, None, None]:
+        """Measure the teardown of a test's fixtures."""
+        yield from self._measure(item, "teardown")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(
+        self, item: pytest.Item, call: pytest.CallInfo
+    ) -> Generator[None, None, None]:
+        """Add the measurements of a test to its teardown report."""
+        if call.when == "teardown":
+            timings = item.stash.get(TIMINGS_KEY, {})
+            wall = {when: timing[0] for when, timing in timings.items()}
+            cpu = {when: timing[1] for when, timing in timings.items()}
+            measurements = {
+                "wall_time": round(sum(wall.values()), 4),
+                "cpu_time": round(sum(cpu.values()), 4),
+                "fixture_time": round(
+                    wall.get("setup", 0) + wall.get("teardown", 0), 4
+                ),
+                "body_time": round(wall.get("call", 0), 4),
+                "peak_rss": peak_rss(),
+                **item.stash.get(NAVIGATION_KEY, {}),
+            }
+            item.user_properties.append((INSTRUMENTATION_PROPERTY, measurements))
+        yield
@@ -0,0 +1,133 @@
+"""Classes and functions for streaming Playtest report records to disk."""
+
+import heapq
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+TRAILER = "Trailer"
+
+
+class NdjsonReportWriter:
+    """Append serialized reports to a newline delimited json file."""
+
+    def __init__(self, path: Path, flush_every: int = 100) -> None:
+        """Open the report file for appending with buffered flushes."""
+        self.path = path
+        self._flush_every = max(1, flush_every)
+        self._pending = 0
+        self._file: IO[str] = open(path, "a", encoding="utf-8")  # noqa: SIM115
+
+    def write(self, data: dict) -> None:
+        """Write a single record as one line of json."""
+        self._file.write(json.dumps(data, separators=(",", ":")) + "\n")
+        self._pending += 1
+
+        # Flush in batches so a crashed session still leaves a usable report
+        if self._pending >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Flush any buffered records to disk."""
+        self._file.flush()
+        self._pending = 0
+
+    def close(self, trailer: dict | None = None) -> None:
+        """Write an optional trailer record and close the file."""
+        if trailer is not None:
+            self.write({"$report_type": TRAILER, **trailer})
+        self._file.close()
+
+
+def read_ndjson(path: Path) -> Iterator[dict]:
+    """Yield each record of a newline delimited json file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crashed session can leave a partially written last line
+                continue
+
+
+class NdjsonTail:
+    """Read the records appended to a newline delimited json file since the last read.
+
+    Only complete lines are read, so a record that is still being written is picked
+    up by the next read.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialise the tail at the start of the file."""
+        self.path = path
+        self._offset = 0
+
+    def read(self, limit: int | None = None) -> list[dict]:
+        """Read up to limit new records."""
+        if not self.path.exists():
+            return []
+
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+
+
+def merge_shards(shard_paths: list[Path], trailers: list[dict]) -> Iterator[dict]:
+    """Yield the records of worker shards merged in order of their start time.
+
+    Each shard is read lazily so only one record per shard is held in memory. The
+    trailer records of the shards are appended to the trailers list as they are met.
+    """
+
+    def records(path: Path) -> Iterator[dict]:
+        for record in read_ndjson(path):
+            if record.get("$report_type") == TRAILER:
+                trailers.append(record)
+            else:
+                yield record
+
+    # Collect reports have no start time so they are merged ahead of test reports
+    yield from heapq.merge(
+        *(records(path) for path in shard_paths),
+        key=lambda record: record.get("start", 0),
+    )
+
+
+def export_json(ndjson_path: Path, json_path: Path, metadata: list) -> None:
+    """Write a compacted json report from an ndjson report without loading it all."""
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write('{"metadata": ')
+        json.dump(metadata, f)
+
+        # Stream the collect reports, then the test reports, in two passes
+        for key, report_type in (
+            ("collect_data", "CollectReport"),
+            ("test_data", "TestReport"),
+        ):
+            f.write(f', "{key}": [')
+            first = True
+            for record in read_ndjson(ndjson_path):
+                if record.get("$report_type") != report_type:
+                    continue
+                if not first:
+                    f.write(", ")
+                json.dump(record, f)
+                first = False
+            f.write("]")
+
+        f.write("}")
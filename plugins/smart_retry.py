@@ -0,0 +1,160 @@
+"""Plugin for retrying only transient failures, with a backoff and a budget."""
+
+import os
+import tempfile
+import time
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from xdist.workermanage import WorkerController
+
+from utils.retry_policy import (
+    TRANSIENT_CLASSES,
+    RetryBudget,
+    classify,
+    failure_message,
+    retry_delay,
+)
+
+# Directory of the files sharing the retry budget of a session with its workers
+BUDGET_DIR = Path(".playtest")
+
+# Stash key for the class of the first failed phase of the current attempt
+FAILURE_KEY = pytest.StashKey[str | None]()
+
+# Stash key for the retry budget of the session
+BUDGET_KEY = pytest.StashKey[RetryBudget | None]()
+
+
+# Hooks
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add a command line option."""
+    parser.addoption(
+        "--playtest-retry-policy",
+        action="store",
+        choices=["all", "smart"],
+        default="all",
+        help="Rerun every failed test, or only the tests failing with a transient "
+        "error such as a timeout, navigation, network or browser error.",
+    )
+    parser.addoption(
+        "--playtest-retry-delay",
+        action="store",
+        type=float,
+        metavar="seconds",
+        default=0,
+        help="Wait this long before the first smart retry of a test and twice as "
+        "long before each further retry.",
+    )
+    parser.addoption(
+        "--playtest-retry-budget",
+        action="store",
+        type=int,
+        metavar="retries",
+        default=0,
+        help="Make no more than this many smart retries in the session, across "
+        "every parallel worker. 0 for no limit.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Create the retry budget of the session, or open it on an xdist worker."""
+    budget = config.option.playtest_retry_budget
+    if config.option.playtest_retry_policy != "smart" or not budget:
+        config.stash[BUDGET_KEY] = None
+        return
+
+    if hasattr(config, "workerinput"):
+        path = Path(config.workerinput["playtest_retry_budget"])
+    else:
+        BUDGET_DIR.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=BUDGET_DIR, prefix="retry_budget_")
+        path = Path(name)
+        os.close(fd)
+    config.stash[BUDGET_KEY] = RetryBudget(path=path, budget=budget)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node: WorkerController) -> None:
+    """Share the retry budget file of the session with an xdist worker."""
+    budget = node.config.stash.get(BUDGET_KEY, None)
+    if budget is not None:
+        node.workerinput["playtest_retry_budget"] = str(budget.path)
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    """Delete the retry budget file of the session."""
+    budget = config.stash.get(BUDGET_KEY, None)
+    if budget is not None and not hasattr(config, "workerinput"):
+        budget.path.unlink(missing_ok=True)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_protocol(item: pytest.Item) -> None:
+    """Mark a test so pytest-rerunfailures asks the retry policy before a rerun."""
+    if item.config.option.playtest_retry_policy != "smart":
+        return
+
+    # A test's own flaky marker takes precedence over the policy
+    if item.get_closest_marker("flaky") is not None:
+        return
+
+    reruns = item.config.getvalue("reruns") or 0
+    item.add_marker(pytest.mark.flaky(reruns=reruns, condition=RetryCondition(item)))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item: pytest.Item) -> None:
+    """Wait before a retry of a test, longer with each retry."""
+    if item.config.option.playtest_retry_policy != "smart":
+        return
+
+    delay = retry_delay(
+        delay=item.config.option.playtest_retry_delay,
+        attempt=getattr(item, "execution_count", 1),
+    )
+    if delay > 0:
+        time.sleep(delay)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo
+) -> Generator[None, None, None]:
+    """Keep the class of the first failed phase of each attempt of a test."""
+    outcome = yield
+    report: pytest.TestReport = outcome.get_result()
+    if item.config.option.playtest_retry_policy != "smart":
+        return
+
+    if report.when == "setup":
+        item.stash[FAILURE_KEY] = None
+    if report.failed and item.stash.get(FAILURE_KEY, None) is None:
+        message = failure_message(report.longrepr, excinfo=call.excinfo)
+        item.stash[FAILURE_KEY] = classify(message)
+
+
+class RetryCondition:
+    """Condition of the flaky marker deciding whether a failed attempt is retried.
+
+    pytest-rerunfailures only evaluates it once an attempt has failed with reruns
+    left, and an attempt is retried when its failure is transient and a retry is
+    left in the budget of the session.
+    """
+
+    def __init__(self, item: pytest.Item) -> None:
+        """Initialise the condition of a test."""
+        self._item = item
+        self._decisions: dict[int, bool] = {}
+
+    def __bool__(self) -> bool:
+        """Check if the current attempt of the test is retried."""
+        attempt = getattr(self._item, "execution_count", 1)
+        # A later failed phase of the same attempt must not use up another retry
+        if attempt not in self._decisions:
+            budget = self._item.config.stash.get(BUDGET_KEY, None)
+            self._decisions[attempt] = self._item.stash.get(
+                FAILURE_KEY, None
+            ) in TRANSIENT_CLASSES and (budget is None or budget.take())
+        return self._decisions[attempt]
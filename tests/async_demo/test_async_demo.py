@@ -0,0 +1,30 @@
+"""Demo async test file for testing the async runner."""
+
+import pytest
+from playwright.async_api import expect
+
+from pages.async_bmi_page import AsyncBMIPage
+from utils.load_data import DataProvider
+
+# Test data, parsed once and cached between workers and runs
+BMI_METRIC_CM_DATA = DataProvider(path="./data/bmi_data_metric_cm.csv")
+
+
+@pytest.mark.smoke()
+@pytest.mark.parametrize(BMI_METRIC_CM_DATA.columns, BMI_METRIC_CM_DATA.params())
+async def test_bmi_metric_centimetres_async(
+    bmi_page: AsyncBMIPage, height: str, weight: str, bmi: str
+) -> None:
+    """Testing the BMI calculator with height (cm) and weight (kg), concurrently."""
+    # Load the webpage
+    await bmi_page.load()
+
+    # Input the height and weight
+    await bmi_page.select_metric_cm()
+    await bmi_page.input_height_weight(height=height, weight=weight)
+
+    # Click calculate
+    await bmi_page.calculate_bmi()
+
+    # Assert that the correct BMI is calculated and displayed
+    await expect(bmi_page.bmi_result).to_have_text(bmi)
@@ -1,4 +1,11 @@
 """File for defining pytest fixtures and plugins."""
 
-
-pytest_plugins = ["fixtures.page_fixtures", "plugins.playtest_report"]
+pytest_plugins = [
+    "fixtures.page_fixtures",
+    "plugins.playtest_report",
+    "plugins.duration_scheduler",
+    "plugins.failure_first",
+    "plugins.smart_retry",
+    "plugins.async_runner",
+    "pytester",
+]
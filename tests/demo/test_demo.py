@@ -4,13 +4,15 @@ import pytest
 from playwright.sync_api import expect
 
 from pages.bmi_page import BMIPage
-from utils.load_data import load_csv_data
+from utils.load_data import DataProvider
+
+# Test data, parsed once and cached between workers and runs
+BMI_METRIC_CM_DATA = DataProvider(path="./data/bmi_data_metric_cm.csv")
 
 
 @pytest.mark.smoke()
-@pytest.mark.parametrize(
-    ("height", "weight", "bmi"), load_csv_data(path="./data/bmi_data_metric_cm.csv")
-)
+@pytest.mark.batched(size=3)
+@pytest.mark.parametrize(BMI_METRIC_CM_DATA.columns, BMI_METRIC_CM_DATA.params())
 def test_bmi_metric_centimetres(
     bmi_page: BMIPage, height: str, weight: str, bmi: str
 ) -> None:
@@ -0,0 +1,36 @@
+"""Tests for the async runner plugin."""
+
+import pytest
+
+# Test file with async tests skipped or expected to fail by their markers
+MARKED_TESTS = """
+import sys
+
+import pytest
+
+
+@pytest.mark.skip(reason="skipped")
+async def test_skip():
+    assert False
+
+
+@pytest.mark.skipif(sys.platform != "", reason="skipped")
+async def test_skipif():
+    assert False
+
+
+@pytest.mark.xfail(run=False, reason="not run")
+async def test_xfail_not_run():
+    assert False
+"""
+
+
+def test_async_runner_evaluates_markers(pytester: pytest.Pytester) -> None:
+    """Test async tests are skipped and xfailed by their markers, not run."""
+    pytester.makeconftest('pytest_plugins = ["plugins.async_runner"]')
+    pytester.makepyfile(test_marked=MARKED_TESTS)
+
+    result = pytester.runpytest("--async-concurrency", "2", "-rsx")
+
+    result.assert_outcomes(skipped=2, xfailed=1)
+    result.stdout.fnmatch_lines(["*test_marked.py*skipped*", "*[[]NOTRUN[]] not run*"])
@@ -0,0 +1,61 @@
+"""Tests for batched tests sharing a page between their cases."""
+
+import pytest
+
+# Conftest replacing pytest-playwright and the batch pages with a fake logging the
+# batches it opens and closes
+FAKE_PAGES = """
+import pytest
+
+pytest_plugins = ["fixtures.page_fixtures"]
+
+
+class FakeBatchPages:
+    def get(self, test, batch):
+        print(f"\\nget {batch}")
+        return object()
+
+    def evict(self, test):
+        print("\\nevict")
+
+
+@pytest.fixture(scope="session")
+def browser_name():
+    return "chromium"
+
+
+@pytest.fixture(scope="session")
+def batch_pages():
+    return FakeBatchPages()
+"""
+
+# Test file with a batched test whose last batch is short
+BATCHED_TESTS = """
+import pytest
+
+
+@pytest.mark.batched(size=2)
+@pytest.mark.parametrize("case", range(5))
+def test_case(playtest_page, case):
+    pass
+"""
+
+
+def test_batch_page_is_closed_after_last_case(pytester: pytest.Pytester) -> None:
+    """Test the page of every batch is closed after its last case, even if short."""
+    pytester.makeconftest(FAKE_PAGES)
+    pytester.makepyfile(test_cases=BATCHED_TESTS)
+
+    result = pytester.runpytest("-p", "no:playwright", "-s", "-q")
+
+    result.assert_outcomes(passed=5)
+    events = [
+        line
+        for line in result.stdout.lines
+        if line in ("get 0", "get 1", "get 2", "evict")
+    ]
+    assert events == [
+        *("get 0", "get 0", "evict"),
+        *("get 1", "get 1", "evict"),
+        *("get 2", "evict"),
+    ]
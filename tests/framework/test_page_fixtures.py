@@ -0,0 +1,41 @@
+"""Tests for the page fixtures."""
+
+import pytest
+
+# Test file with parametrized cases using the playtest page
+PAGE_TESTS = """
+import pytest
+
+
+@pytest.mark.parametrize("height", [180, 182])
+def test_height(playtest_page, height):
+    pass
+"""
+
+
+@pytest.fixture()
+def page_tests(pytester: pytest.Pytester) -> pytest.Pytester:
+    """Pytest fixture for a test directory using the page fixtures."""
+    pytester.makeconftest('pytest_plugins = ["fixtures.page_fixtures"]')
+    pytester.makepyfile(test_page=PAGE_TESTS)
+    return pytester
+
+
+@pytest.mark.parametrize(
+    ("args", "ids"),
+    [
+        ([], ["chromium-180", "chromium-182"]),
+        (
+            ["--browser", "chromium", "--browser", "firefox"],
+            ["chromium-180", "chromium-182", "firefox-180", "firefox-182"],
+        ),
+    ],
+)
+def test_playtest_page_is_parametrized_by_browser(
+    page_tests: pytest.Pytester, args: list[str], ids: list[str]
+) -> None:
+    """Test the playtest page runs every case on each browser, named by browser."""
+    result = page_tests.runpytest("--collect-only", "-q", *args)
+
+    collected = [line for line in result.stdout.lines if "::" in line]
+    assert sorted(collected) == [f"test_page.py::test_height[{case}]" for case in ids]
@@ -0,0 +1,51 @@
+"""Tests for the playtest report plugin."""
+
+from datetime import date
+
+import pytest
+
+from utils.report_catalog import CATALOG_FILE, ReportCatalog
+
+# Test file with a test of each final outcome, skipped in setup in two ways
+OUTCOME_TESTS = """
+import pytest
+
+
+@pytest.fixture()
+def unavailable():
+    pytest.skip("unavailable")
+
+
+def test_passed():
+    pass
+
+
+def test_failed():
+    assert False
+
+
+@pytest.mark.skip(reason="skipped")
+def test_skip_marker():
+    pass
+
+
+def test_skip_fixture(unavailable):
+    pass
+"""
+
+
+def test_catalog_counts_final_outcomes(pytester: pytest.Pytester) -> None:
+    """Test the catalog counts tests skipped in their setup phase."""
+    pytester.makeconftest('pytest_plugins = ["plugins.playtest_report"]')
+    pytester.makepyfile(test_outcomes=OUTCOME_TESTS)
+    report_path = pytester.path / "reports" / "run"
+
+    # Newer pytest-playwright releases fail when nested in a running session
+    result = pytester.runpytest(
+        "-p", "no:playwright", "--playtest-report", str(report_path)
+    )
+    result.assert_outcomes(passed=1, failed=1, skipped=2)
+
+    with ReportCatalog(path=report_path.parent / CATALOG_FILE) as catalog:
+        (run,) = catalog.list_runs(start=date.today(), end=date.today())
+    assert (run["tests"], run["passed"], run["failed"], run["skipped"]) == (4, 1, 1, 2)
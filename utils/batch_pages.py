@@ -0,0 +1,46 @@
+"""Class for sharing a loaded page between the cases of a batched test."""
+
+from contextlib import suppress
+
+from playwright.sync_api import Browser, Error, Page
+
+
+class BatchPages:
+    """Pages kept open across the parametrized cases of a batch.
+
+    The first case of a batch opens a page in a new context and later cases reuse
+    it, so the page is only loaded once per batch. A test keeps a single open page,
+    which is closed when the last case of its batch finishes, when a case fails, or
+    when a case of the test's next batch starts.
+    """
+
+    def __init__(self, browser: Browser, context_args: dict) -> None:
+        """Initialise the batch pages for a browser with the context arguments."""
+        self._browser = browser
+        self._context_args = context_args
+        self._pages: dict[str, tuple[int, Page]] = {}
+
+    def get(self, test: str, batch: int) -> Page:
+        """Get the open page of a test's batch, opening a new one if needed."""
+        if test in self._pages:
+            open_batch, page = self._pages[test]
+            if open_batch == batch and not page.is_closed():
+                return page
+            self.evict(test)
+
+        context = self._browser.new_context(**self._context_args)
+        page = context.new_page()
+        self._pages[test] = (batch, page)
+        return page
+
+    def evict(self, test: str) -> None:
+        """Close the open page of a test."""
+        if test in self._pages:
+            _, page = self._pages.pop(test)
+            with suppress(Error):
+                page.context.close()
+
+    def close(self) -> None:
+        """Close the open page of every test."""
+        for test in list(self._pages):
+            self.evict(test)
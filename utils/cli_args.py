@@ -1,5 +1,40 @@
 """Functions to produce the cli arguments for pytest."""
 
+from pathlib import Path
+
+from utils.report_catalog import recent_failures
+from utils.retry_policy import retry_args
+
+# Directory of the report catalog holding the results of recent runs
+REPORTS_DIR = Path("reports")
+
+# Arguments selecting no tests, as an empty selection would otherwise run every test
+NO_TESTS = ["tests", "--deselect", "tests"]
+
+
+def affected_args(base: str) -> list[str]:
+    """Return the node ids of the tests affected by the changes since a git revision."""
+    # Imported here so the tests are only parsed when affected tests are selected
+    from utils.test_impact import DependencyMap
+
+    nodeids, _ = DependencyMap().select(base=base)
+    return nodeids or NO_TESTS
+
+
+def last_failed(reports_dir: Path, runs: int) -> list[str]:
+    """Get the node ids of the tests that failed or were rerun in recent runs."""
+    return [
+        nodeid
+        for nodeid in recent_failures(reports_dir=reports_dir, runs=runs)
+        # Tests in files that have since been removed cannot be selected
+        if Path(nodeid.partition("::")[0]).is_file()
+    ]
+
+
+def last_failed_args(reports_dir: Path, runs: int) -> list[str]:
+    """Return the node ids of the tests that failed or were rerun in recent runs."""
+    return last_failed(reports_dir=reports_dir, runs=runs) or NO_TESTS
+
 
 def generate_cli_args(config: dict, path: str) -> list:
     """Return a list of string arguments for the pytest.main() call."""
@@ -11,7 +46,15 @@ def generate_cli_args(config: dict, path: str) -> list:
     if config["verbose"]:
         cli_args.append("-v")
 
-    if config["test_dir"] is not None:
+    if config.get("affected", False):
+        cli_args.extend(affected_args(base=config.get("affected-base", "HEAD")))
+    elif config.get("last-failed-runs", 0) > 0:
+        cli_args.extend(
+            last_failed_args(reports_dir=REPORTS_DIR, runs=config["last-failed-runs"])
+        )
+    elif config.get("test_nodeids") is not None:
+        cli_args.extend(config["test_nodeids"] or NO_TESTS)
+    elif config["test_dir"] is not None:
         cli_args.append(config["test_dir"])
     elif config["test_file"] is not None:
         cli_args.append(config["test_file"])
@@ -28,15 +71,98 @@ def generate_cli_args(config: dict, path: str) -> list:
         cli_args.append("--playtest-report")
         cli_args.append(path)
 
+        if config.get("playtest-report-mode", "json") == "stream":
+            cli_args.append("--playtest-report-mode")
+            cli_args.append("stream")
+
+            if not config.get("playtest-report-json", True):
+                cli_args.append("--playtest-report-no-json")
+
+            if config.get("playtest-report-flush") is not None:
+                cli_args.append("--playtest-report-flush")
+                cli_args.append(str(config["playtest-report-flush"]))
+
+        if config["parallel"] and config.get("playtest-report-shards", False):
+            cli_args.append("--playtest-report-shards")
+
+        if config.get("playtest-report-table", False):
+            cli_args.append("--playtest-report-table")
+
+        if config.get("playtest-report-instrument", False):
+            cli_args.append("--playtest-report-instrument")
+
+        if not config.get("playtest-report-catalog", True):
+            cli_args.append("--playtest-report-no-catalog")
+
     if config["parallel"]:
         cli_args.append("--numprocesses")
-        cli_args.append("auto")
+        cli_args.append(str(config.get("workers", "auto")))
+
+        if config.get("schedule", "default") == "duration":
+            cli_args.append("--playtest-schedule")
+            cli_args.append("duration")
+
+    if config.get("context-pool", 0) > 0:
+        cli_args.append("--context-pool")
+        cli_args.append(str(config["context-pool"]))
+
+    if config.get("storage-state-ttl", 0) > 0:
+        cli_args.append("--storage-state-ttl")
+        cli_args.append(str(config["storage-state-ttl"]))
+
+    if config.get("network-mode", "off") != "off":
+        cli_args.append("--network-mode")
+        cli_args.append(config["network-mode"])
+
+    for resource_type in config.get("network-block-types") or []:
+        cli_args.append("--network-block-type")
+        cli_args.append(str(resource_type))
+
+    for domain in config.get("network-block-domains") or []:
+        cli_args.append("--network-block-domain")
+        cli_args.append(str(domain))
 
-    if config["rerun"] > 0:
+    # Async tests run concurrently in the main process, so only in serial runs
+    if config.get("async-concurrency", 0) > 0 and not config["parallel"]:
+        cli_args.append("--async-concurrency")
+        cli_args.append(str(config["async-concurrency"]))
+
+    if config.get("failure-first", False):
+        cli_args.append("--playtest-failure-first")
+        cli_args.append("--playtest-changed-since")
+        cli_args.append(config.get("affected-base", "HEAD"))
+
+    if config.get("maxfail", 0) > 0:
+        cli_args.append("--maxfail")
+        cli_args.append(str(config["maxfail"]))
+
+    if config["rerun"] > 0 and config.get("retry-policy", "all") == "smart":
+        cli_args.extend(
+            retry_args(
+                retries=config["rerun"],
+                delay=config.get("retry-delay", 0),
+                budget=config.get("retry-budget", 0),
+            )
+        )
+    elif config["rerun"] > 0:
         cli_args.append("--reruns")
         cli_args.append(str(config["rerun"]))
 
-    if config["tracing"]:
+    if config.get("capture", "off") != "off":
+        cli_args.append("--playtest-capture")
+        cli_args.append(config["capture"])
+        cli_args.append("--output")
+        cli_args.append(path)
+
+        if config["capture"] == "sampled":
+            cli_args.append("--playtest-capture-sample")
+            cli_args.append(str(config.get("capture-sample", 10)))
+
+        if config.get("capture-budget", 0) > 0:
+            cli_args.append("--playtest-capture-budget")
+            cli_args.append(str(config["capture-budget"]))
+
+    elif config["tracing"]:
         cli_args.append("--tracing")
         cli_args.append("on")
         cli_args.append("--output")
@@ -0,0 +1,75 @@
+"""Class for pooling warm browser contexts and pages between tests."""
+
+from contextlib import suppress
+
+from playwright.sync_api import Browser, Error, Page
+
+# Script to clear the web storage of the origin the page is on
+CLEAR_STORAGE = "() => { localStorage.clear(); sessionStorage.clear(); }"
+
+
+class ContextPool:
+    """Pool of warm browser contexts, each with a single page, reused across tests.
+
+    A page is reset between tests by clearing its cookies, permissions and web
+    storage. Pages that fail the health check or the reset are closed instead of
+    being returned to the pool.
+    """
+
+    def __init__(self, browser: Browser, context_args: dict, size: int) -> None:
+        """Initialise the pool for a browser with the arguments for new contexts."""
+        self._browser = browser
+        self._context_args = context_args
+        self._size = size
+        self._idle: list[Page] = []
+
+    def acquire(self) -> Page:
+        """Take a warm page from the pool or create a new context and page."""
+        if self._idle:
+            return self._idle.pop()
+
+        context = self._browser.new_context(**self._context_args)
+        return context.new_page()
+
+    def release(self, page: Page, healthy: bool = True) -> None:
+        """Reset a page and return it to the pool, or close it if it is polluted."""
+        if healthy and len(self._idle) < self._size and self.is_healthy(page):
+            try:
+                self.reset(page)
+                self._idle.append(page)
+                return
+            except Error:
+                pass
+
+        self.discard(page)
+
+    def is_healthy(self, page: Page) -> bool:
+        """Check the page is open, responsive and the only page in its context."""
+        if page.is_closed() or len(page.context.pages) != 1:
+            return False
+
+        # A crashed page raises on any evaluation
+        try:
+            return page.evaluate("() => true")
+        except Error:
+            return False
+
+    def reset(self, page: Page) -> None:
+        """Clear the state a test left in the page and its context."""
+        # Web storage can only be cleared from a page on the origin it belongs to
+        if page.url.startswith("http"):
+            page.evaluate(CLEAR_STORAGE)
+
+        page.context.clear_cookies()
+        page.context.clear_permissions()
+        page.goto("about:blank")
+
+    def discard(self, page: Page) -> None:
+        """Close a page's context without returning it to the pool."""
+        with suppress(Error):
+            page.context.close()
+
+    def close(self) -> None:
+        """Close every idle context in the pool."""
+        while self._idle:
+            self.discard(self._idle.pop())
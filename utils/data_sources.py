@@ -0,0 +1,243 @@
+"""Classes for reading test data from csv, parquet, jsonl and sqlite sources."""
+
+import json
+import operator
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from csv import reader
+from itertools import chain
+from pathlib import Path
+
+# Filter operators, in the (column, operator, value) form used by pyarrow
+OPERATORS: dict[str, Callable[[object, object], bool]] = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+Filters = list[tuple[str, str, object]]
+
+
+def to_bool(text: str) -> bool:
+    """Convert a text value, e.g. "True", "yes" or "0", to a bool."""
+    value = text.strip().lower()
+    if value in ("true", "yes", "y", "1"):
+        return True
+    if value in ("false", "no", "n", "0", ""):
+        return False
+    raise ValueError(f"Invalid boolean value {text!r}")
+
+
+# Conversions of text values to the type of a filter value, by the exact type
+COERCIONS: dict[type, Callable[[str], object]] = {
+    bool: to_bool,
+    int: int,
+    float: float,
+}
+
+
+def check_operator(op: str) -> None:
+    """Raise a ValueError for an unsupported filter operator."""
+    if op not in OPERATORS:
+        raise ValueError(f"Unsupported filter operator {op}")
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a column or table name for use in sql."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def matches(record: dict, filters: Filters | None) -> bool:
+    """Check a record matches every filter.
+
+    Text values, as read from csv files, are converted to the type of the filter
+    value before they are compared, and a value that cannot be converted never
+    matches.
+    """
+    for column, op, value in filters or []:
+        check_operator(op)
+        cell = record[column]
+        target = next(iter(value), None) if op in ("in", "not in") else value
+        coerce = COERCIONS.get(type(target))
+        if isinstance(cell, str) and coerce is not None:
+            try:
+                cell = coerce(cell)
+            except ValueError:
+                return False
+        if not OPERATORS[op](cell, value):
+            return False
+    return True
+
+
+class DataSource(ABC):
+    """Base class for a source of test data rows.
+
+    A source reads only the requested columns and the rows matching the filters,
+    pushing both down to the storage format where it supports them.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialise the source for a data file."""
+        self.path = Path(path)
+
+    def key(self) -> str:
+        """Get a key identifying the source, used for caching its rows."""
+        return str(self.path.resolve())
+
+    def version(self) -> tuple[int, int]:
+        """Get the modification time and size of the data file."""
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    @abstractmethod
+    def read(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Read the headers and rows of the selected columns and matching rows."""
+
+    def _select(
+        self,
+        headers: tuple[str, ...],
+        records: Iterator[dict],
+        columns: list[str] | None,
+        filters: Filters | None,
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Filter and project records read row by row."""
+        selected = tuple(columns) if columns else headers
+        rows = [
+            tuple(record.get(column) for column in selected)
+            for record in records
+            if matches(record, filters)
+        ]
+        return selected, rows
+
+
+class CsvSource(DataSource):
+    """Data source for a csv file with a header row."""
+
+    def read(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Read the selected columns and matching rows, streaming the file."""
+        with open(self.path, "r", newline="") as file:
+            csv_reader = reader(file)
+            headers = tuple(next(csv_reader))
+            records = (dict(zip(headers, row, strict=False)) for row in csv_reader)
+            return self._select(headers, records, columns, filters)
+
+
+class JsonlSource(DataSource):
+    """Data source for a file with a json object on each line."""
+
+    def read(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Read the selected columns and matching rows, streaming the file."""
+        with open(self.path, "r") as file:
+            records = (json.loads(line) for line in file if line.strip())
+            first = next(records, None)
+            if first is None:
+                return tuple(columns or []), []
+
+            # Without a projection the columns are the keys of the first record
+            headers = tuple(first)
+            return self._select(headers, chain([first], records), columns, filters)
+
+
+class ParquetSource(DataSource):
+    """Data source for a parquet file, reading only the needed columns and groups."""
+
+    def read(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Read the selected columns and matching rows with pyarrow's pushdown."""
+        # Imported here so pyarrow is only loaded for parquet data
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(
+            self.path,
+            columns=columns,
+            filters=(
+                [(c, "==" if op == "=" else op, v) for c, op, v in filters]
+                if filters
+                else None
+            ),
+        )
+        headers = tuple(table.column_names)
+        rows = list(zip(*(table.column(c).to_pylist() for c in headers), strict=True))
+        return headers, rows
+
+
+class SqliteSource(DataSource):
+    """Data source for a sqlite table or query."""
+
+    def __init__(self, path: str | Path, query: str) -> None:
+        """Initialise the source for a table name or select query in a database."""
+        super().__init__(path)
+        self.query = query
+
+    def key(self) -> str:
+        """Get a key identifying the database and query."""
+        return f"{super().key()}:{self.query}"
+
+    def read(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> tuple[tuple[str, ...], list[tuple]]:
+        """Read the selected columns and matching rows in a single sql query."""
+        # A bare table name is read as the whole table
+        source = (
+            self.query if " " in self.query.strip() else quote_identifier(self.query)
+        )
+        projection = ", ".join(map(quote_identifier, columns)) if columns else "*"
+
+        # Only operators from OPERATORS are written into the sql, values are params
+        conditions, params = [], []
+        for column, op, value in filters or []:
+            check_operator(op)
+            if op in ("in", "not in"):
+                values = list(value)
+                placeholders = ", ".join("?" * len(values))
+                conditions.append(
+                    f"{quote_identifier(column)} {op.upper()} ({placeholders})"
+                )
+                params.extend(values)
+            else:
+                conditions.append(
+                    f"{quote_identifier(column)} {'=' if op == '==' else op} ?"
+                )
+                params.append(value)
+
+        sql = f"SELECT {projection} FROM ({source})"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = connection.execute(sql, params)
+            headers = tuple(d[0] for d in cursor.description)
+            return headers, cursor.fetchall()
+        finally:
+            connection.close()
+
+
+def source_for(path: str | Path, query: str | None = None) -> DataSource:
+    """Get the data source for a file from its extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return CsvSource(path)
+    if suffix in (".jsonl", ".ndjson"):
+        return JsonlSource(path)
+    if suffix in (".parquet", ".pq"):
+        return ParquetSource(path)
+    if suffix in (".sqlite", ".sqlite3", ".db"):
+        if query is None:
+            raise ValueError(f"A table or query is needed to read {path}")
+        return SqliteSource(path, query=query)
+    raise ValueError(f"Unsupported data file type {suffix}")
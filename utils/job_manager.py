@@ -0,0 +1,201 @@
+"""Classes for running queued Playtest sessions on a pool of background workers."""
+
+import os
+import subprocess
+import sys
+import threading
+from collections import deque
+from contextlib import suppress
+from pathlib import Path
+
+from utils.cli_args import generate_cli_args
+from utils.run_queue import DONE_STATUSES, RunQueue
+from utils.runner_daemon import DaemonRun, is_running, start_run
+
+# Number of lines of pytest output shown for each job
+OUTPUT_LINES = 200
+
+# Files written by each job in its report directory
+EVENTS_FILE = "playtest_report.ndjson"
+LOG_FILE = "pytest_output.log"
+
+# Host resources reserved for each concurrent run of pytest and its browser
+CORES_PER_RUN = 2
+MEMORY_PER_RUN = 2 * 1024**3
+
+# Seconds an idle worker waits before checking the queue again
+POLL_INTERVAL = 1.0
+
+
+def available_memory() -> int | None:
+    """Get the memory available to new processes in bytes, if it can be read."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def pool_size() -> int:
+    """Get the number of concurrent runs the host's cores and memory can support."""
+    size = (os.cpu_count() or 1) // CORES_PER_RUN
+    memory = available_memory()
+    if memory is not None:
+        size = min(size, memory // MEMORY_PER_RUN)
+    return max(1, size)
+
+
+class Job:
+    """A queued run of a pytest session, with its output and event stream."""
+
+    def __init__(self, run: dict) -> None:
+        """Initialise the job from its row in the run queue."""
+        self.id: str = run["id"]
+        self.owner: str = run["owner"]
+        self.config: dict = run["config"]
+        self.report_path = Path(run["report_path"])
+        self.status: str = run["status"]
+        self.returncode: int | None = run["returncode"]
+        self.submitted: float = run["submitted"]
+        self.started: float | None = run["started"]
+        self.finished: float | None = run["finished"]
+        self.events = self.report_path / EVENTS_FILE
+        self.log = self.report_path / LOG_FILE
+
+    @property
+    def cli_args(self) -> list[str]:
+        """Get the pytest arguments of the job's session."""
+        return generate_cli_args(config=self.config, path=str(self.report_path))
+
+    @property
+    def args(self) -> list[str]:
+        """Get the command running the job's pytest session."""
+        return [sys.executable, "-m", "pytest", *self.cli_args]
+
+    @property
+    def done(self) -> bool:
+        """Return True if the job has finished, failed or been cancelled."""
+        return self.status in DONE_STATUSES
+
+    def output(self, lines: int = OUTPUT_LINES) -> list[str]:
+        """Get the last lines of the job's pytest output."""
+        if not self.log.exists():
+            return []
+        with open(self.log, "r", errors="replace") as f:
+            return [line.rstrip() for line in deque(f, maxlen=lines)]
+
+
+class JobManager:
+    """Pool of background workers running pytest sessions from the run queue.
+
+    The pool is sized to the host's cores and memory, and each worker runs one
+    pytest process at a time, so concurrent users share the host without
+    overloading it. Runs are persisted in the queue, so their status and results
+    can be read by every Streamlit session and survive a restart of the app.
+    """
+
+    def __init__(
+        self, queue: RunQueue | None = None, workers: int | None = None
+    ) -> None:
+        """Initialise the manager and start its workers."""
+        self._queue = queue or RunQueue()
+        self.workers = workers or pool_size()
+        self._processes: dict[str, subprocess.Popen | DaemonRun] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+        # Runs left running by a server that has stopped will never finish
+        self._queue.fail_interrupted()
+
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, config: dict, report_path: Path, owner: str) -> Job:
+        """Queue a run of a config from run_config for an owner."""
+        # Parallel runs share the host's cores between the workers of the pool
+        if config.get("parallel"):
+            config = {
+                **config,
+                "workers": max(1, (os.cpu_count() or 1) // self.workers),
+            }
+
+        run_id = self._queue.submit(owner=owner, config=config, report_path=report_path)
+        self._wake.set()
+        return self.get(run_id)
+
+    def get(self, job_id: str) -> Job | None:
+        """Get a job by its id."""
+        run = self._queue.get(job_id)
+        return Job(run) if run is not None else None
+
+    def jobs(self, limit: int = 50) -> list[Job]:
+        """List the most recently submitted jobs."""
+        return [Job(run) for run in self._queue.list_runs(limit=limit)]
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued job or terminate a running one."""
+        self._queue.cancel(job_id)
+        with self._lock:
+            process = self._processes.get(job_id)
+        if process is not None:
+            process.terminate()
+
+    def _work(self) -> None:
+        """Claim and run queued jobs one at a time."""
+        while True:
+            run = self._queue.claim()
+            if run is None:
+                self._wake.wait(timeout=POLL_INTERVAL)
+                self._wake.clear()
+                continue
+
+            self._run(Job(run))
+
+    def _run(self, job: Job) -> None:
+        """Run a job's pytest session and record its status when it stops."""
+        try:
+            returncode = self._execute(job)
+        except Exception as e:
+            # A session that cannot be started, e.g. when the runner daemon stopped
+            # after it was checked, fails the job without stopping the worker
+            with suppress(OSError), open(job.log, "a") as log:
+                log.write(f"Could not start the test run: {e!r}\n")
+            self._queue.finish(job.id, status="failed", returncode=None)
+            return
+        finally:
+            with self._lock:
+                self._processes.pop(job.id, None)
+
+        # Exit codes 0 and 1 are sessions where every test ran, and 5 is a session
+        # where no tests were selected, e.g. when no tests are affected by a change
+        status = "finished" if returncode in (0, 1, 5) else "failed"
+        self._queue.finish(job.id, status=status, returncode=returncode)
+
+    def _execute(self, job: Job) -> int:
+        """Run a job's pytest session, writing its output to the job's log.
+
+        The session is forked from the runner daemon when it is running, to skip the
+        start up of a new Python process.
+        """
+        job.report_path.mkdir(parents=True, exist_ok=True)
+        with open(job.log, "w") as log:
+            if is_running():
+                process = start_run(
+                    args=job.cli_args, stdout=log.fileno(), stderr=log.fileno()
+                )
+            else:
+                process = subprocess.Popen(
+                    args=job.args, stdout=log, stderr=subprocess.STDOUT
+                )
+            with self._lock:
+                self._processes[job.id] = process
+            self._queue.set_pid(job.id, process.pid)
+
+            return process.wait()
@@ -1,9 +1,10 @@
 """Functions for gettings lists of files and directories."""
 
 import os
-import re
 from pathlib import Path
 
+from utils.test_index import index_file
+
 
 def list_test_folders() -> list[Path]:
     """Return a list of directories nested in the tests directory."""
@@ -28,22 +29,8 @@ def list_test_files(dir: Path) -> list[Path]:
 
 
 def list_test_cases(file: Path) -> list[str]:
-    """List test functions in a test file."""
-    # Initialise an empty list
-    all_tests = []
-    # Iterate over each line in the file
-    with open(file=file, mode="r") as f:
-        for line in f:
-            # Ignore the line if it is a comment
-            if line[0] == "#":
-                continue
-
-            # If the line includes a function, append the function name to the list
-            elif "def" in line:
-                regex_line = re.search(r"([A-Za-z0-9]+(_[A-Za-z0-9]+)+)", line)
-                all_tests.append(regex_line.group())
-
-    return all_tests
+    """List test functions and methods in a test file."""
+    return [test["name"] for test in index_file(file)]
 
 
 def list_json_report_files(date: str) -> list[Path]:
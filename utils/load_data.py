@@ -1,6 +1,20 @@
-"""File containing functions for loading test data."""
+"""File containing functions and classes for loading test data."""
 
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import namedtuple
+from collections.abc import Callable, Iterator
 from csv import reader
+from pathlib import Path
+
+import pytest
+
+from utils.data_sources import DataSource, Filters, source_for
+
+# Directory for the parsed data file caches
+DATA_CACHE_DIR = Path(".playtest") / "data"
 
 
 def load_csv_data(path: str) -> list[tuple]:
@@ -14,3 +28,141 @@ def load_csv_data(path: str) -> list[tuple]:
 
         # Get all rows of the csv file as a list of tuples
         return list(map(tuple, csv_reader))
+
+
+class DataProvider:
+    """Lazy provider of parametrized test data from csv, parquet, jsonl or sqlite.
+
+    The source is only read when its rows are first needed, and only for the selected
+    columns and the rows matching the filters. The rows read are cached as a pickle
+    keyed by the source, selection and the file's modification time. Collection on
+    every xdist worker, and in later runs, loads the cache instead of reading the
+    source again. Rows are named tuples with fields named after the columns.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | DataSource,
+        query: str | None = None,
+        columns: list[str] | None = None,
+        filters: Filters | None = None,
+        types: dict[str, Callable[[str], object]] | None = None,
+        id_columns: list[str] | None = None,
+        cache_dir: Path = DATA_CACHE_DIR,
+    ) -> None:
+        """Initialise the provider for a data file or source.
+
+        query is the table or select query of a sqlite file, columns and filters,
+        as (column, operator, value) tuples, select what is read from the source,
+        types maps column names to functions converting their values, and
+        id_columns are the columns used in the test ids, defaulting to every column.
+        Ids are the source values joined by "-", the same as pytest's default ids, so
+        test node ids do not change when a test moves to the provider.
+        """
+        self.source = path if isinstance(path, DataSource) else source_for(path, query)
+        self._columns = columns
+        self._filters = filters
+        self._types = types or {}
+        self._id_columns = id_columns
+        self._cache_dir = cache_dir
+        self._headers: tuple[str, ...] | None = None
+        self._rows: list[tuple] | None = None
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        """Get the names of the selected columns."""
+        return self._load()[0]
+
+    def _cache_path(self) -> Path:
+        """Get the path of the cache file for the source and selection."""
+        selection = f"{self.source.key()}:{self._columns!r}:{self._filters!r}"
+        key = hashlib.sha256(selection.encode()).hexdigest()
+        return self._cache_dir / f"{key}.pickle"
+
+    def _load(self) -> tuple[tuple[str, ...], list[tuple]]:
+        """Get the headers and rows from the cache, reading the source if stale."""
+        if self._rows is not None:
+            return self._headers, self._rows
+
+        version = self.source.version()
+        cache_path = self._cache_path()
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached["version"] == version:
+                self._headers, self._rows = cached["headers"], cached["rows"]
+                return self._headers, self._rows
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            pass
+
+        self._headers, self._rows = self.source.read(
+            columns=self._columns, filters=self._filters
+        )
+
+        # Write through a temporary file so other workers never read a partial cache
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                {"version": version, "headers": self._headers, "rows": self._rows},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, cache_path)
+
+        return self._headers, self._rows
+
+    def _typed_rows(
+        self,
+        where: Callable[[tuple], bool] | None = None,
+        shard: tuple[int, int] | None = None,
+    ) -> Iterator[tuple[tuple, tuple]]:
+        """Yield the source values and typed row of each selected row."""
+        headers, rows = self._load()
+        row_type = namedtuple("Row", headers, rename=True)
+        converters = [self._types.get(header) for header in headers]
+
+        for index, values in enumerate(rows):
+            if shard is not None and index % shard[1] != shard[0]:
+                continue
+
+            row = row_type(
+                *(
+                    convert(value) if convert is not None else value
+                    for convert, value in zip(converters, values, strict=True)
+                )
+            )
+            if where is None or where(row):
+                yield values, row
+
+    def rows(
+        self,
+        where: Callable[[tuple], bool] | None = None,
+        shard: tuple[int, int] | None = None,
+    ) -> Iterator[tuple]:
+        """Yield the typed rows.
+
+        where filters the typed rows, and shard is a tuple of (index, count) that
+        only yields every count-th row starting at index.
+        """
+        for _, row in self._typed_rows(where=where, shard=shard):
+            yield row
+
+    def row_id(self, values: tuple) -> str:
+        """Get the test id of a row from its source values."""
+        if self._id_columns is None:
+            return "-".join(map(str, values))
+
+        by_column = dict(zip(self.columns, values, strict=True))
+        return "-".join(str(by_column[column]) for column in self._id_columns)
+
+    def params(
+        self,
+        where: Callable[[tuple], bool] | None = None,
+        shard: tuple[int, int] | None = None,
+    ) -> list[tuple]:
+        """Get the rows as pytest parameters with ids from their source values."""
+        return [
+            pytest.param(*row, id=self.row_id(values))
+            for values, row in self._typed_rows(where=where, shard=shard)
+        ]
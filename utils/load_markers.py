@@ -1,6 +1,5 @@
 """Functions for loading pytest markers."""
 
-
 import toml
 
 
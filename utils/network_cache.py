@@ -0,0 +1,135 @@
+"""Class for recording, replaying and blocking the network requests of a page."""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playwright.sync_api import Error, Page, Request, Route
+
+MODES = ["off", "record", "replay", "block"]
+
+# Headers that no longer apply once Playwright has decoded a fetched body
+DECODED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write a file through a temporary file so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class NetworkCache:
+    """Network layer over Playwright routing for a page.
+
+    In record mode responses are fetched from the network and saved to a content
+    addressed store, in replay mode they are served from the store without any
+    network access, and in block mode requests go to the network as normal. In every
+    mode requests for the blocked resource types and domains are aborted.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        store: Path,
+        block_resource_types: list[str] | None = None,
+        block_domains: list[str] | None = None,
+    ) -> None:
+        """Initialise the network layer with its mode, store and block lists."""
+        self.mode = mode
+        self._store = store
+        self._block_resource_types = set(block_resource_types or [])
+        self._block_domains = tuple(block_domains or [])
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if the network layer needs to route any requests."""
+        return self.mode in ("record", "replay") or bool(
+            self._block_resource_types or self._block_domains
+        )
+
+    def attach(self, page: Page) -> None:
+        """Route every request of the page through the network layer."""
+        # Remove routes from an earlier test when the page is reused from a pool
+        page.unroute("**/*")
+        if self.enabled:
+            page.route("**/*", self._handle)
+
+    def is_blocked(self, request: Request) -> bool:
+        """Check if a request is for a blocked resource type or domain."""
+        if request.resource_type in self._block_resource_types:
+            return True
+
+        host = urlsplit(request.url).hostname or ""
+        return any(
+            host == domain or host.endswith(f".{domain}")
+            for domain in self._block_domains
+        )
+
+    def _key(self, request: Request) -> str:
+        """Get the store key of a request from its method, url and body."""
+        key = f"{request.method} {request.url}"
+        if request.post_data_buffer:
+            key += " " + hashlib.sha256(request.post_data_buffer).hexdigest()
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _handle(self, route: Route) -> None:
+        """Block, record, replay or continue a routed request."""
+        request = route.request
+        if self.is_blocked(request):
+            route.abort("blockedbyclient")
+        elif self.mode == "record":
+            self._record(route)
+        elif self.mode == "replay":
+            self._replay(route)
+        else:
+            route.continue_()
+
+    def _record(self, route: Route) -> None:
+        """Fetch a response from the network, save it and fulfil the request."""
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Error:
+            route.abort()
+            return
+
+        # Bodies are stored by their hash so identical assets are only stored once
+        body_hash = hashlib.sha256(body).hexdigest()
+        write_atomic(self._store / "blobs" / body_hash, body)
+
+        entry = {
+            "method": route.request.method,
+            "url": route.request.url,
+            "status": response.status,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in DECODED_HEADERS
+            },
+            "body": body_hash,
+        }
+        entry_path = self._store / "entries" / f"{self._key(route.request)}.json"
+        write_atomic(entry_path, json.dumps(entry).encode())
+
+        route.fulfill(response=response, body=body)
+
+    def _replay(self, route: Route) -> None:
+        """Fulfil a request from the store, aborting it if it was never recorded."""
+        entry_path = self._store / "entries" / f"{self._key(route.request)}.json"
+        if not entry_path.exists():
+            route.abort("internetdisconnected")
+            return
+
+        with open(entry_path) as f:
+            entry = json.load(f)
+        route.fulfill(
+            status=entry["status"],
+            headers=entry["headers"],
+            body=(self._store / "blobs" / entry["body"]).read_bytes(),
+        )
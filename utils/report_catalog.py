@@ -0,0 +1,249 @@
+"""Class for recording and querying Playtest runs in an on-disk catalog."""
+
+import json
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from utils.report_model import ReportIndex
+
+CATALOG_FILE = "catalog.sqlite"
+
+# Schema user_version set once the existing reports have been added to the catalog
+BACKFILLED_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    args TEXT,
+    tests INTEGER,
+    passed INTEGER,
+    failed INTEGER,
+    rerun INTEGER,
+    skipped INTEGER,
+    duration REAL,
+    exitstatus INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT NOT NULL,
+    nodeid TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    reruns INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    PRIMARY KEY (run, nodeid)
+);
+"""
+
+
+def result_counts(results: dict[str, dict]) -> dict[str, int]:
+    """Count the tests of a run by their final outcome, and the reruns of its tests.
+
+    Tests that errored are counted as failed, and xfailed tests as skipped.
+    """
+    counts = {"tests": len(results), "passed": 0, "failed": 0, "skipped": 0}
+    counts["rerun"] = sum(result["reruns"] for result in results.values())
+    for result in results.values():
+        outcome = "failed" if result["outcome"] == "error" else result["outcome"]
+        if outcome in counts:
+            counts[outcome] += 1
+    return counts
+
+
+class ReportCatalog:
+    """Catalog of Playtest runs stored in a SQLite database.
+
+    Each run is recorded by the playtest-report plugin when the session finishes, so
+    reports can be queried by date without scanning the reports directory.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open the catalog database, creating it if it does not exist."""
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+
+        # WAL lets the Reports page read while a finishing run writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "ReportCatalog":
+        """Return the catalog for use as a context manager."""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the catalog when leaving the context manager."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the catalog database."""
+        self._conn.close()
+
+    def is_backfilled(self) -> bool:
+        """Return True if the existing reports have been added to the catalog."""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        return version >= BACKFILLED_VERSION
+
+    def record_run(
+        self,
+        path: Path,
+        started: float,
+        finished: float,
+        args: list[str],
+        counts: dict[str, int],
+        duration: float,
+        exitstatus: int,
+        results: dict[str, dict] | None = None,
+    ) -> None:
+        """Record a finished run, its outcome totals and the result of each test."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(path.resolve()),
+                    started,
+                    finished,
+                    json.dumps(list(args)),
+                    counts.get("tests", 0),
+                    counts.get("passed", 0),
+                    counts.get("failed", 0),
+                    counts.get("rerun", 0),
+                    counts.get("skipped", 0),
+                    duration,
+                    exitstatus,
+                ),
+            )
+            self._conn.execute(
+                "DELETE FROM results WHERE run = ?", (str(path.resolve()),)
+            )
+            self._conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        str(path.resolve()),
+                        nodeid,
+                        result["outcome"],
+                        result["reruns"],
+                        result["duration"],
+                    )
+                    for nodeid, result in (results or {}).items()
+                ),
+            )
+
+    def list_runs(self, start: date, end: date) -> list[dict]:
+        """List the runs started between two dates inclusive, newest first."""
+        start_ts = datetime.combine(start, time.min).timestamp()
+        end_ts = datetime.combine(end + timedelta(days=1), time.min).timestamp()
+        rows = self._conn.execute(
+            "SELECT * FROM runs WHERE started >= ? AND started < ? "
+            "ORDER BY started DESC",
+            (start_ts, end_ts),
+        ).fetchall()
+        return [{**row, "args": json.loads(row["args"] or "[]")} for row in rows]
+
+    def latest_runs(self, limit: int) -> list[dict]:
+        """List the most recently started runs, newest first."""
+        rows = self._conn.execute(
+            "SELECT * FROM runs ORDER BY started DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [{**row, "args": json.loads(row["args"] or "[]")} for row in rows]
+
+    def failing_tests(self, runs: int) -> list[str]:
+        """List the tests that failed or were rerun in the most recent runs.
+
+        Tests are ordered by the number of runs they failed in, then by the number
+        of runs they were rerun in, and then by how recently they last did either.
+        """
+        rows = self._conn.execute(
+            "SELECT nodeid, "
+            "SUM(outcome IN ('failed', 'error')) AS failed, "
+            "SUM(reruns > 0) AS rerun, MAX(recent.started) AS last "
+            "FROM results JOIN "
+            "(SELECT path, started FROM runs ORDER BY started DESC LIMIT ?) recent "
+            "ON results.run = recent.path "
+            "WHERE outcome IN ('failed', 'error') OR reruns > 0 "
+            "GROUP BY nodeid ORDER BY failed DESC, rerun DESC, last DESC",
+            (runs,),
+        ).fetchall()
+        return [row["nodeid"] for row in rows]
+
+    def backfill(self, report_files: list[Path]) -> int:
+        """Record runs of existing json reports that are missing from the catalog."""
+        known = {row[0] for row in self._conn.execute("SELECT path FROM runs")}
+        added = 0
+        for file in report_files:
+            if str(file.parent.resolve()) in known:
+                continue
+
+            # Report folders are named after the time the run started, with a
+            # numbered suffix when several runs started in the same second
+            started_at = "_".join(file.parent.name.split("_")[:2])
+            try:
+                started = datetime.strptime(started_at, "%d-%m-%Y_%H-%M-%S")
+                started_ts = started.timestamp()
+            except ValueError:
+                started_ts = file.stat().st_mtime
+
+            # A report can be corrupt, or still being written by a finishing run
+            try:
+                with open(file) as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            metadata = data.get("metadata", [])
+            if len(metadata) < 2:
+                continue
+
+            index = ReportIndex.from_test_data(test_data=data.get("test_data", []))
+            reruns: dict[str, int] = {}
+            for failure in index.failures:
+                if failure["outcome"] == "rerun":
+                    reruns[failure["nodeid"]] = reruns.get(failure["nodeid"], 0) + 1
+
+            results = {
+                result["Test Case"]: {
+                    "outcome": result["Outcome"],
+                    "reruns": reruns.get(result["Test Case"], 0),
+                    "duration": result["Total Duration"],
+                }
+                for result in index.results()
+            }
+            self.record_run(
+                path=file.parent,
+                started=started_ts,
+                finished=file.stat().st_mtime,
+                args=metadata[0].get("args", []),
+                counts=result_counts(results=results),
+                duration=metadata[1].get("total_duration", 0.0),
+                exitstatus=metadata[0].get("exitstatus", 0),
+                results=results,
+            )
+            added += 1
+
+        with self._conn:
+            self._conn.execute(f"PRAGMA user_version = {BACKFILLED_VERSION}")
+        return added
+
+
+def open_report_catalog(reports_dir: Path, rebuild: bool = False) -> ReportCatalog:
+    """Open the catalog of a reports directory, adding the existing reports once.
+
+    Reports of runs made before the catalog existed are added the first time it is
+    opened, so later opens do not scan the reports directory. Reports of runs made
+    with --playtest-report-no-catalog are only added when rebuild is True.
+    """
+    catalog = ReportCatalog(path=reports_dir / CATALOG_FILE)
+    if rebuild or not catalog.is_backfilled():
+        catalog.backfill(report_files=sorted(reports_dir.glob("*/*.json")))
+    return catalog
+
+
+def recent_failures(reports_dir: Path, runs: int) -> list[str]:
+    """List the tests that failed or were rerun in the most recent catalogued runs."""
+    if not (reports_dir / CATALOG_FILE).exists():
+        return []
+    with ReportCatalog(path=reports_dir / CATALOG_FILE) as catalog:
+        return catalog.failing_tests(runs=runs)
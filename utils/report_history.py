@@ -0,0 +1,108 @@
+"""Functions for building and analysing the test history across Playtest runs."""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from utils.report_model import summarise_reports
+from utils.report_table import SUMMARY_FILE, read_summary_table
+
+HISTORY_FILE = "history.parquet"
+
+HISTORY_COLUMNS = ["nodeid", "when", "outcome", "duration", "rerun"]
+
+HISTORY_FRAME_COLUMNS = ["run", "started", *HISTORY_COLUMNS]
+
+QUANTILES = {"p50": 0.5, "p95": 0.95}
+
+
+def load_run_rows(report_dir: Path) -> pd.DataFrame:
+    """Load the summary rows of a single run from its table or json report."""
+    summary_path = report_dir / SUMMARY_FILE
+    if summary_path.exists():
+        summary_df, _ = read_summary_table(path=summary_path)
+        return summary_df[HISTORY_COLUMNS]
+
+    with open(report_dir / "playtest_report.json") as f:
+        test_data = json.load(f).get("test_data", [])
+    rows = [row for row, _ in summarise_reports(test_data)]
+    return pd.DataFrame(data=rows, columns=HISTORY_COLUMNS)
+
+
+def update_history(history_path: Path, runs: list[dict]) -> pd.DataFrame:
+    """Add the rows of any runs missing from the history file and return it.
+
+    Only runs that have not been added before are read from disk, so the history
+    grows incrementally as new runs are catalogued.
+    """
+    frames = [pd.read_parquet(history_path)] if history_path.exists() else []
+    known = set(frames[0]["run"].unique()) if frames else set()
+
+    new_rows = []
+    for run in runs:
+        if run["path"] in known:
+            continue
+        try:
+            run_rows = load_run_rows(report_dir=Path(run["path"]))
+        except FileNotFoundError:
+            continue
+        new_rows.append(run_rows.assign(run=run["path"], started=run["started"]))
+
+    if not new_rows:
+        return frames[0] if frames else pd.DataFrame(columns=HISTORY_FRAME_COLUMNS)
+
+    history = pd.concat([*frames, *new_rows], ignore_index=True)
+    history.to_parquet(history_path, index=False)
+    return history
+
+
+def mean_durations(history: pd.DataFrame, runs: list[dict]) -> dict[str, float]:
+    """Get the mean total duration of each test, including its reruns, over runs."""
+    history = history[history["run"].isin([run["path"] for run in runs])]
+    per_run = history.groupby(["run", "nodeid"])["duration"].sum()
+    return per_run.groupby("nodeid").mean().to_dict()
+
+
+def test_statistics(history: pd.DataFrame, runs: list[dict]) -> pd.DataFrame:
+    """Get the pass rate, rerun rate and phase durations of each test over runs."""
+    history = history[history["run"].isin([run["path"] for run in runs])]
+    if history.empty:
+        return pd.DataFrame()
+
+    # Only the phases of the final run of a test decide whether it passed
+    final_run = history["rerun"] == history.groupby(["run", "nodeid"])[
+        "rerun"
+    ].transform("max")
+    final = history[final_run].assign(
+        passed=lambda df: (df["when"] == "call") & (df["outcome"] == "passed")
+    )
+
+    per_run = history.groupby(["run", "nodeid"]).agg(reruns=("rerun", "max"))
+    per_run["passed"] = final.groupby(["run", "nodeid"])["passed"].any()
+    per_run["rerun"] = per_run["reruns"] > 0
+
+    stats = per_run.groupby("nodeid").agg(
+        runs=("passed", "size"),
+        pass_rate=("passed", "mean"),
+        rerun_rate=("rerun", "mean"),
+    )
+
+    # Quantiles of each phase duration over the final runs of each test
+    durations = (
+        final.groupby(["nodeid", "when"])["duration"]
+        .quantile(list(QUANTILES.values()))
+        .unstack(level=[1, 2])
+    )
+    for when in ("setup", "call", "teardown"):
+        for name, q in QUANTILES.items():
+            column = (when, q)
+            stats[f"{when} {name}"] = (
+                durations[column] if column in durations.columns else 0.0
+            )
+
+    stats["total p95"] = stats[[f"{w} p95" for w in ("setup", "call", "teardown")]].sum(
+        axis=1
+    )
+
+    return stats.reset_index().rename(columns={"nodeid": "Test Case"})
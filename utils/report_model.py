@@ -0,0 +1,225 @@
+"""Classes and functions for indexing the test reports of a Playtest report."""
+
+from collections.abc import Iterable, Iterator
+
+# Name of the user property holding the instrumentation of a test
+INSTRUMENTATION_PROPERTY = "playtest_instrumentation"
+
+# Name of the user property holding the class of a failure, e.g. a timeout
+FAILURE_CLASS_PROPERTY = "playtest_failure_class"
+
+# Name of the user property holding the paths of the artifacts of a test, e.g. traces
+ARTIFACTS_PROPERTY = "playtest_artifacts"
+
+# Measurements recorded by the instrumentation of each test
+INSTRUMENTATION_FIELDS = [
+    "wall_time",
+    "cpu_time",
+    "fixture_time",
+    "body_time",
+    "peak_rss",
+    "page_load",
+    "dom_content_loaded",
+    "requests",
+    "transfer_bytes",
+]
+
+
+def failure_location(longrepr: dict | str | list | None) -> tuple[str, int, str]:
+    """Return the path, line number and message of a failed report's crash."""
+    if isinstance(longrepr, dict) and longrepr.get("reprcrash"):
+        crash = longrepr["reprcrash"]
+        return crash.get("path", ""), crash.get("lineno", 0), crash.get("message", "")
+
+    # Skipped reports store a (path, lineno, reason) list instead
+    if isinstance(longrepr, list) and len(longrepr) == 3:
+        return str(longrepr[0]), int(longrepr[1]), str(longrepr[2])
+
+    return "", 0, str(longrepr or "")
+
+
+def failure_lines(longrepr: dict | str | list | None) -> list[str]:
+    """Return the error message lines of a failed report's traceback."""
+    if not isinstance(longrepr, dict):
+        return [str(longrepr or "")]
+
+    entries = (longrepr.get("reprtraceback") or {}).get("reprentries") or []
+    if not entries:
+        return [failure_location(longrepr)[2]]
+
+    data = entries[0].get("data") or {}
+    return [str(line) for line in data.get("lines", [])]
+
+
+def instrumentation(report: dict) -> dict:
+    """Return the instrumentation recorded in a report's user properties, if any."""
+    found: dict = {}
+    for name, value in report.get("user_properties") or []:
+        # A rerun appends its own instrumentation, so the last one is kept
+        if name == INSTRUMENTATION_PROPERTY:
+            found = value
+    return found
+
+
+def failure_class(report: dict) -> str | None:
+    """Return the failure class recorded in a report's user properties, if any."""
+    for name, value in report.get("user_properties") or []:
+        if name == FAILURE_CLASS_PROPERTY:
+            return value
+    return None
+
+
+def artifact_paths(report: dict) -> list[str]:
+    """Return the artifact paths recorded in a report's user properties."""
+    paths = []
+    for name, value in report.get("user_properties") or []:
+        if name == ARTIFACTS_PROPERTY:
+            paths.extend(value)
+    return paths
+
+
+def summarise_report(report: dict, rerun: int = 0) -> dict:
+    """Return a flat summary row of a serialized test report."""
+    failed = report["outcome"] != "passed"
+    path, lineno, message = (
+        failure_location(report.get("longrepr")) if failed else ("", 0, "")
+    )
+    measured = instrumentation(report)
+
+    return {
+        "nodeid": report["nodeid"],
+        "when": report["when"],
+        "outcome": report["outcome"],
+        "duration": report["duration"],
+        "start": report.get("start", 0.0),
+        "stop": report.get("stop", 0.0),
+        "worker": report.get("worker", ""),
+        "rerun": rerun,
+        "path": path,
+        "lineno": lineno,
+        "message": message,
+        "failure_class": failure_class(report),
+        "artifacts": artifact_paths(report),
+        **{field: measured.get(field) for field in INSTRUMENTATION_FIELDS},
+    }
+
+
+def summarise_reports(test_data: Iterable[dict]) -> Iterator[tuple[dict, dict]]:
+    """Yield a summary row with its rerun index along with each test report."""
+    attempts: dict[str, int] = {}
+    for report in test_data:
+        # Each rerun starts with a new setup phase
+        nodeid = report["nodeid"]
+        if report["when"] == "setup":
+            attempts[nodeid] = attempts.get(nodeid, -1) + 1
+
+        yield summarise_report(report=report, rerun=attempts.get(nodeid, 0)), report
+
+
+class ReportIndex:
+    """Index of the test reports in a Playtest report by node id and phase.
+
+    The index is built in a single pass over the reports and provides the outcome
+    counts, the per test durations and the list of failures.
+    """
+
+    def __init__(self) -> None:
+        """Initialise an empty index."""
+        self.tests: dict[str, dict[str, dict]] = {}
+        self.counts: dict[str, int] = {"passed": 0, "failed": 0, "rerun": 0}
+        self.failures: list[dict] = []
+        self.artifacts: list[dict] = []
+        self._artifact_paths: set[str] = set()
+        self._attempts: dict[str, int] = {}
+
+    @classmethod
+    def from_test_data(cls, test_data: Iterable[dict]) -> "ReportIndex":
+        """Build the index from the serialized test reports of a json report."""
+        index = cls()
+        for row, report in summarise_reports(test_data):
+            index.add(row=row, longrepr=report.get("longrepr"))
+        return index
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "ReportIndex":
+        """Build the index from rows that have already been summarised."""
+        index = cls()
+        for row in rows:
+            index.add(row=row)
+        return index
+
+    def add_report(self, report: dict) -> None:
+        """Add a serialized test report as it arrives, counting its reruns."""
+        # Each rerun starts with a new setup phase
+        nodeid = report["nodeid"]
+        if report["when"] == "setup":
+            self._attempts[nodeid] = self._attempts.get(nodeid, -1) + 1
+
+        row = summarise_report(report=report, rerun=self._attempts.get(nodeid, 0))
+        self.add(row=row, longrepr=report.get("longrepr"))
+
+    def add(self, row: dict, longrepr: dict | str | list | None = None) -> None:
+        """Add a summary row to the index."""
+        nodeid = row["nodeid"]
+        outcome = row["outcome"]
+
+        # A new setup phase starts a rerun, which replaces the phases of the last run
+        if row["when"] == "setup" or nodeid not in self.tests:
+            self.tests[nodeid] = {}
+        self.tests[nodeid][row["when"]] = row
+
+        if row["when"] == "call" and outcome in self.counts:
+            self.counts[outcome] += 1
+
+        if outcome in ("failed", "rerun"):
+            self.failures.append({**row, "longrepr": longrepr})
+
+        # The user properties of a test are kept across its phases and reruns, so
+        # each artifact is taken from the first teardown it appears in
+        for path in row.get("artifacts") or []:
+            if path not in self._artifact_paths:
+                self._artifact_paths.add(path)
+                self.artifacts.append(
+                    {"nodeid": nodeid, "rerun": row["rerun"], "path": path}
+                )
+
+    def instrumentation(self) -> list[dict]:
+        """Return a row of the instrumentation of each instrumented test."""
+        rows = []
+        for nodeid, phases in self.tests.items():
+            teardown = phases.get("teardown", {})
+            if teardown.get("wall_time") is not None:
+                rows.append(
+                    {
+                        "Test Case": nodeid,
+                        **{field: teardown[field] for field in INSTRUMENTATION_FIELDS},
+                    }
+                )
+        return rows
+
+    def results(self) -> list[dict]:
+        """Return a row of the outcome and phase durations for each test."""
+        results = []
+        for nodeid, phases in self.tests.items():
+            durations = {when: phases[when]["duration"] for when in phases}
+
+            # A test that failed in setup has no call phase, so report it as an error
+            if "call" in phases:
+                outcome = phases["call"]["outcome"]
+            elif phases.get("setup", {}).get("outcome") == "failed":
+                outcome = "error"
+            else:
+                outcome = phases.get("setup", {}).get("outcome", "unknown")
+
+            results.append(
+                {
+                    "Test Case": nodeid,
+                    "Outcome": outcome,
+                    "Setup Duration": durations.get("setup", 0.0),
+                    "Call Duration": durations.get("call", 0.0),
+                    "Teardown Duration": durations.get("teardown", 0.0),
+                    "Total Duration": sum(durations.values()),
+                }
+            )
+
+        return results
@@ -0,0 +1,147 @@
+"""Functions for writing and reading the columnar summary of a Playtest report."""
+
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.report_model import INSTRUMENTATION_FIELDS, summarise_reports
+
+SUMMARY_FILE = "playtest_summary.parquet"
+
+PHASES = ["setup", "call", "teardown"]
+
+OUTCOMES = ["passed", "failed", "rerun"]
+
+SCHEMA = pa.schema(
+    [
+        ("nodeid", pa.string()),
+        ("when", pa.string()),
+        ("outcome", pa.string()),
+        ("duration", pa.float64()),
+        ("start", pa.float64()),
+        ("stop", pa.float64()),
+        ("worker", pa.string()),
+        ("rerun", pa.int32()),
+        ("path", pa.string()),
+        ("lineno", pa.int32()),
+        ("message", pa.string()),
+        ("failure_class", pa.string()),
+        ("artifacts", pa.list_(pa.string())),
+        ("wall_time", pa.float64()),
+        ("cpu_time", pa.float64()),
+        ("fixture_time", pa.float64()),
+        ("body_time", pa.float64()),
+        ("peak_rss", pa.int64()),
+        ("page_load", pa.float64()),
+        ("dom_content_loaded", pa.float64()),
+        ("requests", pa.int64()),
+        ("transfer_bytes", pa.int64()),
+    ]
+)
+
+
+def write_summary_table(
+    test_data: Iterable[dict], path: Path, metadata: list, batch_size: int = 10_000
+) -> None:
+    """Write one row per test report phase to a parquet file in batches."""
+    # Keep the report metadata with the table so the json is not needed to show it
+    schema = SCHEMA.with_metadata({"playtest_metadata": json.dumps(metadata)})
+
+    with pq.ParquetWriter(where=path, schema=schema) as writer:
+        batch = []
+        for row, _ in summarise_reports(test_data):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def read_summary_table(path: Path) -> tuple[pd.DataFrame, list]:
+    """Read the summary table and the report metadata stored with it."""
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[b"playtest_metadata"])
+    return table.to_pandas(), metadata
+
+
+def outcome_counts(df: pd.DataFrame) -> dict[str, int]:
+    """Get the number of passed, failed and rerun calls from the summary table."""
+    counts = df.loc[df["when"] == "call", "outcome"].value_counts()
+    return {outcome: int(counts.get(outcome, 0)) for outcome in OUTCOMES}
+
+
+def results_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a dataframe of the outcome and phase durations of each test."""
+    # Only keep the phases of the final run of each test
+    last_run = df[df["rerun"] == df.groupby("nodeid")["rerun"].transform("max")]
+    last_run = last_run.drop_duplicates(subset=["nodeid", "when"], keep="last")
+
+    nodeids = pd.unique(df["nodeid"])
+    durations = (
+        last_run.pivot(index="nodeid", columns="when", values="duration")
+        .reindex(index=nodeids, columns=PHASES)
+        .fillna(0.0)
+    )
+    outcomes = last_run.pivot(index="nodeid", columns="when", values="outcome").reindex(
+        index=nodeids, columns=PHASES
+    )
+
+    # A test that failed in setup has no call phase, so report it as an error
+    outcome = (
+        outcomes["call"]
+        .fillna(outcomes["setup"].replace({"failed": "error"}))
+        .fillna("unknown")
+    )
+
+    return pd.DataFrame(
+        {
+            "Test Case": nodeids,
+            "Outcome": outcome.to_numpy(),
+            "Setup Duration": durations["setup"].to_numpy(),
+            "Call Duration": durations["call"].to_numpy(),
+            "Teardown Duration": durations["teardown"].to_numpy(),
+            "Total Duration": durations.sum(axis=1).to_numpy(),
+        }
+    )
+
+
+def failure_records(df: pd.DataFrame) -> list[dict]:
+    """Return the failed and rerun phases of the summary table as records."""
+    failures = df[df["outcome"].isin(["failed", "rerun"])]
+    return [{**row, "longrepr": None} for row in failures.to_dict(orient="records")]
+
+
+def artifact_records(df: pd.DataFrame) -> list[dict]:
+    """Return the artifacts recorded in the summary table as records."""
+    # Tables written before artifacts were recorded have no artifacts column
+    if "artifacts" not in df:
+        return []
+
+    # The user properties of a test are kept across its phases and reruns, so each
+    # artifact is taken from the first row it appears in
+    rows = df[["nodeid", "rerun", "artifacts"]].explode("artifacts").dropna()
+    rows = rows.drop_duplicates(subset=["artifacts"], keep="first")
+    return [
+        {"nodeid": row.nodeid, "rerun": row.rerun, "path": row.artifacts}
+        for row in rows.itertuples()
+    ]
+
+
+def instrumentation_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a dataframe of the instrumentation of each instrumented test."""
+    # Tables written before instrumentation was added have none of its columns
+    if "wall_time" not in df:
+        return pd.DataFrame(columns=["Test Case", *INSTRUMENTATION_FIELDS])
+
+    # The instrumentation is recorded on the teardown of the final run of each test
+    teardowns = df[(df["when"] == "teardown") & df["wall_time"].notna()]
+    teardowns = teardowns.drop_duplicates(subset=["nodeid"], keep="last")
+    return teardowns[["nodeid", *INSTRUMENTATION_FIELDS]].rename(
+        columns={"nodeid": "Test Case"}
+    )
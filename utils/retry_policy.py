@@ -0,0 +1,108 @@
+"""Functions for classifying test failures and retrying only transient ones."""
+
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+# Patterns of the exception type and message of each class of failure, checked in
+# order, so a failed expect() is an assertion even when it mentions a timeout
+FAILURE_CLASSES = {
+    "assertion": [r"AssertionError", r"^assert "],
+    "timeout": [r"TimeoutError", r"Timeout \d+ms exceeded"],
+    "navigation": [
+        r"net::ERR_",
+        r"NS_ERROR_",
+        r"Navigation failed",
+        r"interrupted by another navigation",
+        r"[Ff]rame (was|has been) detached",
+    ],
+    "network": [
+        r"ConnectionError",
+        r"ConnectionResetError",
+        r"ECONNRESET",
+        r"ECONNREFUSED",
+        r"socket hang up",
+    ],
+    "browser": [
+        r"Target page, context or browser has been closed",
+        r"Browser has been closed",
+        r"Page crashed",
+    ],
+}
+
+# Classes of failure caused by the environment rather than by the application
+TRANSIENT_CLASSES = ["timeout", "navigation", "network", "browser"]
+
+# Factor the delay before a retry grows by with each retry of a test
+BACKOFF_FACTOR = 2.0
+
+
+def classify(message: str) -> str:
+    """Get the class of a failure from its exception type and message."""
+    for name, patterns in FAILURE_CLASSES.items():
+        if any(re.search(pattern, message) for pattern in patterns):
+            return name
+    return "other"
+
+
+def failure_message(
+    longrepr: object, excinfo: pytest.ExceptionInfo | None = None
+) -> str:
+    """Get the exception type and message of a failure.
+
+    The exception is used when it is available, as it is by pytest-rerunfailures,
+    since the crash message of a failed assert does not include its type.
+    """
+    if excinfo is not None:
+        return f"{excinfo.typename}: {excinfo.value}"
+
+    crash = getattr(longrepr, "reprcrash", None)
+    if crash is not None:
+        return crash.message
+    return str(longrepr or "")
+
+
+def retry_args(retries: int, delay: float, budget: int) -> list[str]:
+    """Return the arguments retrying only transient failures.
+
+    Failed tests are retried up to retries times when their failure is transient,
+    waiting delay seconds before the first retry and twice as long before each
+    further retry, until budget retries have been used across the session.
+    """
+    args = ["--reruns", str(retries), "--playtest-retry-policy", "smart"]
+    if delay > 0:
+        args += ["--playtest-retry-delay", str(delay)]
+    if budget > 0:
+        args += ["--playtest-retry-budget", str(budget)]
+    return args
+
+
+def retry_delay(delay: float, attempt: int) -> float:
+    """Get the delay before an attempt of a test, the first attempt being 1."""
+    if attempt < 2:
+        return 0.0
+    return delay * BACKOFF_FACTOR ** (attempt - 2)
+
+
+class RetryBudget:
+    """Budget of retries shared by the parallel workers of a session through a file.
+
+    Each retry appends a byte to the file and the offset it ends at is its place in
+    the budget, so workers share the budget without a lock.
+    """
+
+    def __init__(self, path: Path, budget: int) -> None:
+        """Initialise the budget of a session with the path of its file."""
+        self.path = path
+        self._budget = budget
+
+    def take(self) -> bool:
+        """Use a retry from the budget, returning False once it is spent."""
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, b".")
+            return os.lseek(fd, 0, os.SEEK_CUR) <= self._budget
+        finally:
+            os.close(fd)
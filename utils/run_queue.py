@@ -0,0 +1,196 @@
+"""Class for a persistent queue of Playtest run requests."""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+# Path of the run queue database
+QUEUE_PATH = Path(".playtest") / "run_queue.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    config TEXT NOT NULL,
+    report_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    returncode INTEGER,
+    pid INTEGER,
+    server INTEGER,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status, submitted);
+"""
+
+# Statuses of runs that will not change again
+DONE_STATUSES = ("finished", "failed", "cancelled")
+
+
+def process_alive(pid: int) -> bool:
+    """Check if a process with an id is running on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RunQueue:
+    """Queue of run requests stored in a SQLite database.
+
+    Runs are claimed fairly between owners: the next run is the oldest queued run
+    of the owner with the fewest runs in progress, taking turns between owners with
+    the same number, so one user queueing many runs does not hold up everyone else.
+    Each call uses its own connection, so the queue can be shared by worker threads
+    and Streamlit sessions.
+    """
+
+    def __init__(self, path: Path = QUEUE_PATH) -> None:
+        """Open the queue database, creating it if it does not exist."""
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+            # Queues created before runs recorded the server claiming them
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "server" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN server INTEGER")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the queue database."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _row(self, row: sqlite3.Row | None) -> dict | None:
+        """Convert a database row to a dict with its config decoded."""
+        if row is None:
+            return None
+        return {**dict(row), "config": json.loads(row["config"])}
+
+    def submit(self, owner: str, config: dict, report_path: Path) -> str:
+        """Queue a run of a config from run_config and return its id."""
+        run_id = uuid.uuid4().hex[:8]
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO runs (id, owner, config, report_path, status, submitted) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (run_id, owner, json.dumps(config), str(report_path), time.time()),
+            )
+        finally:
+            conn.close()
+        return run_id
+
+    def claim(self) -> dict | None:
+        """Mark the next run, in fair order between owners, as running and return it."""
+        conn = self._connect()
+        try:
+            # An immediate transaction stops two workers claiming the same run
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT * FROM runs AS r WHERE status = 'queued'
+                ORDER BY (
+                    SELECT COUNT(*) FROM runs
+                    WHERE owner = r.owner AND status = 'running'
+                ), (
+                    SELECT COALESCE(MAX(started), 0) FROM runs WHERE owner = r.owner
+                ), submitted
+                LIMIT 1
+                """).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE runs SET status = 'running', started = ?, server = ? "
+                    "WHERE id = ?",
+                    (time.time(), os.getpid(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        return self.get(row["id"]) if row is not None else None
+
+    def set_pid(self, run_id: str, pid: int) -> None:
+        """Record the process id of a running run."""
+        self._update("UPDATE runs SET pid = ? WHERE id = ?", (pid, run_id))
+
+    def finish(self, run_id: str, status: str, returncode: int | None) -> None:
+        """Record the status and exit code of a run that has stopped."""
+        self._update(
+            "UPDATE runs SET status = ?, returncode = ?, finished = ? "
+            "WHERE id = ? AND status != 'cancelled'",
+            (status, returncode, time.time(), run_id),
+        )
+
+    def cancel(self, run_id: str) -> dict | None:
+        """Mark a queued or running run as cancelled and return it."""
+        self._update(
+            "UPDATE runs SET status = 'cancelled', finished = ? "
+            "WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), run_id),
+        )
+        return self.get(run_id)
+
+    def fail_interrupted(self) -> None:
+        """Mark runs left running by a server that has stopped as failed.
+
+        Runs claimed by other servers sharing the queue that are still running are
+        left alone. This server has not claimed any runs yet, so runs recorded with
+        its process id were claimed by an earlier server, e.g. in a container.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, server FROM runs WHERE status = 'running'"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            server = row["server"]
+            if server is None or server == os.getpid() or not process_alive(server):
+                self._update(
+                    "UPDATE runs SET status = 'failed', finished = ? "
+                    "WHERE id = ? AND status = 'running'",
+                    (time.time(), row["id"]),
+                )
+
+    def _update(self, sql: str, params: tuple) -> None:
+        """Run a single update statement."""
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    def get(self, run_id: str) -> dict | None:
+        """Get a run by its id."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row(row)
+
+    def list_runs(self, limit: int = 50) -> list[dict]:
+        """List the most recently submitted runs."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM runs ORDER BY submitted DESC LIMIT ?", (limit,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._row(row) for row in rows]
@@ -0,0 +1,238 @@
+"""Daemon that keeps pytest and the Playtest modules imported for fast test runs.
+
+Start the daemon with `python -m utils.runner_daemon`. While it runs, main.py and
+the Streamlit app send their runs to it over a local socket instead of starting a
+new Python process, and each run is forked from the daemon's warm interpreter.
+"""
+
+import importlib
+import os
+import secrets
+import signal
+import sys
+from contextlib import suppress
+from importlib.metadata import entry_points
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.reduction import recv_handle, send_handle
+from pathlib import Path
+
+# Files of the daemon's socket and the key clients authenticate with
+SOCKET_PATH = Path(".playtest") / "runner.sock"
+KEY_PATH = Path(".playtest") / "runner.key"
+
+# Modules imported once by the daemon and inherited by every run, along with the
+# installed pytest plugins
+WARM_MODULES = [
+    "pytest",
+    "playwright.sync_api",
+    "playwright.async_api",
+    "yaml",
+    "fixtures.page_fixtures",
+    "plugins.playtest_report",
+    "plugins.duration_scheduler",
+    "plugins.async_runner",
+]
+
+# Root of the project, whose modules are reloaded when their source changes
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def authkey() -> bytes:
+    """Get the key shared by the daemon and its clients, creating it if needed."""
+    if not KEY_PATH.exists():
+        KEY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+    return KEY_PATH.read_bytes()
+
+
+def warm_imports() -> None:
+    """Import the warm modules and every installed pytest plugin."""
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    for entry_point in entry_points(group="pytest11"):
+        with suppress(Exception):
+            entry_point.load()
+
+
+def is_running() -> bool:
+    """Check if a daemon is listening on the socket."""
+    if not hasattr(os, "fork") or not SOCKET_PATH.exists():
+        return False
+    try:
+        Client(str(SOCKET_PATH), family="AF_UNIX", authkey=authkey()).close()
+    except (OSError, EOFError):
+        return False
+    return True
+
+
+def project_modules() -> dict[str, float]:
+    """Get the source modification time of every imported project module.
+
+    The daemon's own module, which is __main__ when it is run with python -m, is
+    left out, as it cannot be imported again while it is running.
+    """
+    mtimes = {}
+    for name, module in list(sys.modules.items()):
+        if name in ("__main__", __name__, "utils.runner_daemon"):
+            continue
+        path = getattr(module, "__file__", None)
+        if path is None:
+            continue
+        path = Path(path).resolve()
+        if path.is_relative_to(PROJECT_ROOT) and ".venv" not in path.parts:
+            try:
+                mtimes[name] = path.stat().st_mtime
+            except OSError:
+                mtimes[name] = 0.0
+    return mtimes
+
+
+class RunnerDaemon:
+    """Server forking a warm interpreter for each pytest run it receives.
+
+    The imports of pytest, Playwright and the Playtest plugins are done once. When
+    the source of a project module changes, the project's modules are dropped and
+    imported again before the next run, while third party modules stay imported.
+    Browsers are not kept between runs, as a Playwright connection cannot be shared
+    with a forked process.
+    """
+
+    def __init__(self) -> None:
+        """Import the warm modules and record the project's module sources."""
+        warm_imports()
+        self._mtimes = project_modules()
+
+    def refresh(self) -> list[str]:
+        """Import the project's modules again if any of their sources changed."""
+        current = project_modules()
+        changed = [
+            name
+            for name, mtime in current.items()
+            if self._mtimes.get(name, mtime) != mtime
+        ]
+        if changed:
+            # Modules importing a changed module hold references to its old objects
+            for name in current:
+                sys.modules.pop(name, None)
+            warm_imports()
+            self._mtimes = project_modules()
+        return changed
+
+    def serve(self) -> None:
+        """Accept run requests until the daemon is stopped."""
+        # Forked runs are reaped automatically
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+        SOCKET_PATH.unlink(missing_ok=True)
+        with Listener(
+            str(SOCKET_PATH), family="AF_UNIX", authkey=authkey()
+        ) as listener:
+            print(f"Playtest runner daemon listening on {SOCKET_PATH}", flush=True)
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError):
+                    continue
+                self._handle(conn)
+
+    def _handle(self, conn: Connection) -> None:
+        """Fork a run for a request, passing it the client's output streams."""
+        try:
+            request = conn.recv()
+            stdout, stderr = recv_handle(conn), recv_handle(conn)
+        except (OSError, EOFError):
+            conn.close()
+            return
+
+        changed = self.refresh()
+        if changed:
+            print(f"Reloaded project modules after changes to {changed}", flush=True)
+
+        pid = os.fork()
+        if pid == 0:
+            self._run(conn, request, stdout, stderr)
+
+        os.close(stdout)
+        os.close(stderr)
+        conn.close()
+
+    def _run(self, conn: Connection, request: dict, stdout: int, stderr: int) -> None:
+        """Run pytest in a forked process and send its exit code to the client."""
+        import pytest
+
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.setsid()
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+        os.chdir(request["cwd"])
+        conn.send({"pid": os.getpid()})
+
+        # Plugins imported by the daemon cannot have their asserts rewritten
+        args = ["-W", "ignore::pytest.PytestAssertRewriteWarning", *request["args"]]
+
+        code = 1
+        try:
+            code = int(pytest.main(args=args))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            try:
+                conn.send({"exitcode": code})
+            finally:
+                os._exit(code)
+
+
+class DaemonRun:
+    """Run of pytest forked by the daemon, with the interface of a Popen."""
+
+    def __init__(self, conn: Connection) -> None:
+        """Initialise the run from its connection, once the daemon has forked it."""
+        self._conn = conn
+        self.pid: int = conn.recv()["pid"]
+        self.returncode: int | None = None
+
+    def wait(self) -> int:
+        """Wait for the run to finish and return its exit code."""
+        if self.returncode is None:
+            try:
+                self.returncode = self._conn.recv()["exitcode"]
+            except EOFError:
+                # The run was killed before it could send its exit code
+                self.returncode = -signal.SIGTERM
+            self._conn.close()
+        return self.returncode
+
+    def terminate(self) -> None:
+        """Stop the run."""
+        with suppress(ProcessLookupError):
+            os.killpg(self.pid, signal.SIGTERM)
+
+
+def start_run(args: list[str], stdout: int = 1, stderr: int = 2) -> DaemonRun:
+    """Send a pytest run to the daemon, writing its output to the given files."""
+    conn = Client(str(SOCKET_PATH), family="AF_UNIX", authkey=authkey())
+    conn.send({"args": args, "cwd": os.getcwd()})
+    send_handle(conn, stdout, os.getpid())
+    send_handle(conn, stderr, os.getpid())
+    return DaemonRun(conn)
+
+
+def run_pytest(args: list[str]) -> int:
+    """Run pytest in the daemon when it is running, or in this process otherwise."""
+    if not is_running():
+        import pytest
+
+        return int(pytest.main(args=args))
+
+    run = start_run(args=args)
+    try:
+        return run.wait()
+    except KeyboardInterrupt:
+        run.terminate()
+        return run.wait()
+
+
+if __name__ == "__main__":
+    RunnerDaemon().serve()
@@ -0,0 +1,103 @@
+"""Class for caching browser storage state snapshots of primed page objects."""
+
+import json
+import time
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+
+from playwright.sync_api import BrowserContext
+
+# Script to restore the web storage of a snapshot for the origin of each page.
+# Init scripts cannot be removed, so a context that was given an older snapshot
+# runs its script first, and the values it restored are replaced by the newer one.
+RESTORE_STORAGE = """
+(origins) => {
+    const previous = window.__playtestRestored || new Set();
+    const restored = new Set();
+    const origin = origins.find((o) => o.origin === location.origin);
+    const items = origin ? origin.localStorage : [];
+    for (const name of previous) {
+        if (!items.some((item) => item.name === name)) localStorage.removeItem(name);
+    }
+    for (const { name, value } of items) {
+        if (previous.has(name) || localStorage.getItem(name) === null) {
+            localStorage.setItem(name, value);
+            restored.add(name);
+        }
+    }
+    window.__playtestRestored = restored;
+}
+"""
+
+
+class StorageStateCache:
+    """Cache of browser storage state snapshots with a time to live.
+
+    A snapshot is captured once after a page object's prime step, such as accepting
+    cookies or logging in, and applied to later browser contexts so they start in
+    the primed state. Snapshots are stored on disk and expire after the ttl.
+    """
+
+    def __init__(self, directory: Path, ttl: float) -> None:
+        """Initialise the cache in a directory with the ttl in seconds."""
+        self._directory = directory
+        self._ttl = ttl
+        self._states: dict[str, tuple[float, dict]] = {}
+        self._scripted: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        """Get the path of the snapshot file for a key."""
+        return self._directory / f"{key}.json"
+
+    def load(self, key: str) -> dict | None:
+        """Get the snapshot for a key, or None if there is none or it has expired."""
+        if key not in self._states and self._path(key).exists():
+            with open(self._path(key)) as f:
+                data = json.load(f)
+            self._states[key] = (data["captured"], data["state"])
+
+        if key not in self._states:
+            return None
+
+        captured, state = self._states[key]
+        if time.time() - captured > self._ttl:
+            self.invalidate(key)
+            return None
+
+        return state
+
+    def save(self, key: str, state: dict) -> None:
+        """Store the snapshot for a key."""
+        captured = time.time()
+        self._states[key] = (captured, state)
+        with open(self._path(key), "w") as f:
+            json.dump({"captured": captured, "state": state}, f)
+
+    def invalidate(self, key: str | None = None) -> None:
+        """Remove the snapshot for a key, or every snapshot if no key is given."""
+        keys = [key] if key is not None else [p.stem for p in self._directory.glob("*")]
+        for k in keys:
+            self._states.pop(k, None)
+            self._path(k).unlink(missing_ok=True)
+
+    def get_or_prime(self, key: str, prime: Callable[[], dict]) -> dict:
+        """Get the snapshot for a key, capturing it with the prime step if missing."""
+        state = self.load(key)
+        if state is None:
+            state = prime()
+            self.save(key, state)
+        return state
+
+    def apply(self, context: BrowserContext, state: dict) -> None:
+        """Apply a snapshot's cookies and web storage to an existing context."""
+        if state.get("cookies"):
+            context.add_cookies(state["cookies"])
+
+        # Web storage is restored by an init script, added to a context again only
+        # when the snapshot was refreshed since, e.g. for a pooled context
+        origins = json.dumps(state.get("origins") or [])
+        if state.get("origins") and self._scripted.get(context) != origins:
+            context.add_init_script(script=f"({RESTORE_STORAGE})({origins})")
+            self._scripted[context] = origins
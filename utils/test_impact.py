@@ -0,0 +1,358 @@
+"""Class for mapping tests to the files they depend on, to select affected tests."""
+
+import ast
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from utils.test_index import TestIndex
+
+# Path of the cached dependency map
+IMPACT_PATH = Path(".playtest") / "test_impact.json"
+
+# Files configuring the whole session, which every test depends on
+SESSION_FILES = ["pyproject.toml", "requirements.txt"]
+
+# Parsed module of a file that cannot be parsed
+EMPTY_MODULE = {
+    "imports": {},
+    "paths": [],
+    "names": [],
+    "plugins": [],
+    "fixtures": {},
+    "tests": {},
+}
+
+
+def _names(nodes: list[ast.AST]) -> set[str]:
+    """Get the names used in a list of nodes, e.g. classes, functions and modules."""
+    return {n.id for node in nodes for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def _fixture_requests(node: ast.AST) -> set[str]:
+    """Get the names of fixtures requested with request.getfixturevalue()."""
+    return {
+        n.args[0].value
+        for n in ast.walk(node)
+        if isinstance(n, ast.Call)
+        and isinstance(n.func, ast.Attribute)
+        and n.func.attr == "getfixturevalue"
+        and n.args
+        and isinstance(n.args[0], ast.Constant)
+        and isinstance(n.args[0].value, str)
+    }
+
+
+def _is_fixture(node: ast.FunctionDef) -> bool:
+    """Check if a function is decorated with pytest.fixture."""
+    for decorator in node.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        name = target.attr if isinstance(target, ast.Attribute) else target
+        if getattr(name, "id", name) == "fixture":
+            return True
+    return False
+
+
+def _function(node: ast.FunctionDef, extra: list[ast.AST] | None = None) -> dict:
+    """Get the fixtures and names a test or fixture function depends on."""
+    return {
+        "args": [a.arg for a in node.args.args if a.arg not in ("self", "cls")],
+        "names": sorted(_names([node, *(extra or [])])),
+        "requests": sorted(_fixture_requests(node)),
+    }
+
+
+def parse_module(path: Path) -> dict:
+    """Parse the imports, fixtures, tests and referenced file paths of a module."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=str(path))
+
+    functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+    imports: dict[str, str] = {}
+    paths = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports[alias.asname or alias.name.split(".")[0]] = alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+        elif (
+            isinstance(node, ast.Constant)
+            and isinstance(node.value, str)
+            and len(node.value) < 256
+            and Path(node.value).suffix
+            and not any(c.isspace() for c in node.value)
+        ):
+            # Strings that look like file paths, e.g. test data files
+            paths.add(node.value)
+
+    plugins, fixtures, tests, module_code = [], {}, {}, []
+    for node in tree.body:
+        if isinstance(node, functions):
+            if _is_fixture(node):
+                fixtures[node.name] = _function(node)
+            elif node.name.startswith("test"):
+                tests[node.name] = _function(node)
+
+        elif isinstance(node, ast.ClassDef):
+            # Tests in a class also depend on the class's decorators and attributes
+            class_code = [
+                *node.decorator_list,
+                *(n for n in node.body if not isinstance(n, functions)),
+            ]
+            for method in node.body:
+                if not isinstance(method, functions):
+                    continue
+                if _is_fixture(method):
+                    fixtures[method.name] = _function(method, extra=class_code)
+                elif node.name.startswith("Test") and method.name.startswith("test"):
+                    tests[f"{node.name}::{method.name}"] = _function(
+                        method, extra=class_code
+                    )
+
+        else:
+            module_code.append(node)
+            if isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == "pytest_plugins"
+                for t in node.targets
+            ):
+                value = node.value
+                values = value.elts if isinstance(value, ast.List | ast.Tuple) else []
+                plugins = [v.value for v in values if isinstance(v, ast.Constant)]
+
+    return {
+        "imports": imports,
+        "paths": sorted(paths),
+        "names": sorted(_names(module_code)),
+        "plugins": plugins,
+        "fixtures": fixtures,
+        "tests": tests,
+    }
+
+
+def changed_files(base: str = "HEAD") -> set[str] | None:
+    """Get the files changed since a git revision, or None if git is unavailable.
+
+    Uncommitted and untracked files are included, with paths relative to the
+    current directory.
+    """
+    commands = [
+        ["git", "diff", "--name-only", "--relative", base],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    files = set()
+    try:
+        for command in commands:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+            files.update(line for line in result.stdout.splitlines() if line)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return files
+
+
+class DependencyMap:
+    """Map of each test to the project files it depends on, parsed statically.
+
+    A test depends on its test file, the modules used by the test and by the
+    module level code of its file, the fixtures it uses and the modules those use,
+    and the files whose paths appear in any of these modules, e.g. test data. Every
+    test also depends on the conftest files and plugins loaded for it. Parsed
+    modules are cached on disk and only parsed again once they are modified.
+    """
+
+    def __init__(self, root: Path = Path("tests"), path: Path = IMPACT_PATH) -> None:
+        """Initialise the map of a tests directory, loading the cached modules."""
+        self._root = root
+        self._path = path
+        self._modules: dict[str, dict] = {}
+        self.selected: float | None = None
+        self._changed = False
+        if path.exists():
+            try:
+                with open(path) as f:
+                    cached = json.load(f)
+                self._modules = cached["modules"]
+                self.selected = cached.get("selected")
+            except (OSError, ValueError, KeyError):
+                self._modules = {}
+
+    def _module(self, path: Path) -> dict | None:
+        """Get the parsed module of a file, parsing it if it was modified."""
+        key = path.as_posix()
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+        entry = self._modules.get(key)
+        if entry is None or entry["mtime"] != mtime:
+            try:
+                parsed = parse_module(path)
+            except (SyntaxError, ValueError):
+                parsed = EMPTY_MODULE
+            entry = self._modules[key] = {"mtime": mtime, "module": parsed}
+            self._changed = True
+        return entry["module"]
+
+    def _module_path(self, name: str) -> Path | None:
+        """Get the source file of a project module, or None for other modules."""
+        # "from package import module" imports a module, not a name in the package
+        for candidate in (name, name.rpartition(".")[0]):
+            if not candidate:
+                continue
+            base = Path(*candidate.split("."))
+            for path in (base.with_suffix(".py"), base / "__init__.py"):
+                if path.is_file():
+                    return path
+        return None
+
+    def _module_files(self, path: Path, files: set[str]) -> None:
+        """Add a module, the project modules it imports and the files it names."""
+        key = path.as_posix()
+        if key in files:
+            return
+        files.add(key)
+
+        module = self._module(path)
+        if module is None:
+            return
+        for name in module["imports"].values():
+            imported = self._module_path(name)
+            if imported is not None:
+                self._module_files(imported, files)
+        files.update(self._paths(module))
+
+    def _paths(self, module: dict) -> set[str]:
+        """Get the existing project files whose paths appear in a module."""
+        paths = set()
+        for value in module["paths"]:
+            path = Path(os.path.normpath(value))
+            if not path.is_absolute() and not value.endswith(".py") and path.is_file():
+                paths.add(path.as_posix())
+        return paths
+
+    def _name_files(self, module: dict, names: list[str], files: set[str]) -> None:
+        """Add the project modules of names used in a module, and their dependencies."""
+        for name in names:
+            imported = module["imports"].get(name)
+            path = self._module_path(imported) if imported is not None else None
+            if path is not None:
+                self._module_files(path, files)
+
+    def _fixture_modules(self, test_file: Path) -> list[Path]:
+        """List the modules providing fixtures to a test file, closest first."""
+        conftests = [
+            directory / "conftest.py"
+            for directory in [test_file.parent, *test_file.parent.parents]
+            if (directory / "conftest.py").is_file()
+        ]
+        plugins = []
+        for path in [test_file, *conftests]:
+            module = self._module(path) or {}
+            for name in module.get("plugins", []):
+                plugin = self._module_path(name)
+                if plugin is not None:
+                    plugins.append(plugin)
+        return [test_file, *conftests, *plugins]
+
+    def _fixture_files(
+        self, names: list[str], providers: list[Path], files: set[str], seen: set[str]
+    ) -> None:
+        """Add the files of fixtures and of the fixtures they use in turn."""
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+
+            for provider in providers:
+                module = self._module(provider)
+                if module is None or name not in module["fixtures"]:
+                    continue
+
+                fixture = module["fixtures"][name]
+                self._name_files(module, fixture["names"], files)
+                self._fixture_files(
+                    [*fixture["args"], *fixture["requests"]], providers, files, seen
+                )
+                break
+
+    def dependencies(self) -> dict[str, set[str]]:
+        """Get the files each test depends on, by the test's node id."""
+        index = TestIndex(root=self._root).update()
+        dependencies = {}
+        for test_file in index.files():
+            module = self._module(test_file)
+            if module is None:
+                continue
+
+            providers = self._fixture_modules(test_file)
+            # Every test in a file depends on its module level code and plugins
+            shared = {p.as_posix() for p in providers}
+            shared.update(p for p in SESSION_FILES if Path(p).is_file())
+            shared.update(self._paths(module))
+            self._name_files(module, module["names"], shared)
+
+            for name, test in module["tests"].items():
+                files = set(shared)
+                self._name_files(module, test["names"], files)
+                self._fixture_files(
+                    [*test["args"], *test["requests"]], providers, files, set()
+                )
+                dependencies[f"{test_file.as_posix()}::{name}"] = files
+
+        self._save()
+        return dependencies
+
+    def affected(self, changed: set[str]) -> list[str]:
+        """Select the node ids of the tests depending on any of the changed files."""
+        changed = {Path(os.path.normpath(p)).as_posix() for p in changed}
+        return sorted(
+            nodeid for nodeid, files in self.dependencies().items() if files & changed
+        )
+
+    def modified_since(self, since: float) -> set[str]:
+        """Get the files any test depends on that were modified after a time."""
+        files = set().union(*self.dependencies().values())
+        modified = set()
+        for file in files:
+            try:
+                if os.stat(file).st_mtime > since:
+                    modified.add(file)
+            except OSError:
+                modified.add(file)
+        return modified
+
+    def select(
+        self, base: str = "HEAD", record: bool = True
+    ) -> tuple[list[str], set[str]]:
+        """Select the tests affected by the files changed since a git revision.
+
+        Without git, the files modified since the last recorded selection are used,
+        or every test is selected the first time.
+        """
+        changed = changed_files(base=base)
+        if changed is None:
+            if self.selected is None:
+                changed = set().union(*self.dependencies().values())
+            else:
+                changed = self.modified_since(self.selected)
+
+        if record:
+            self.selected = time.time()
+            self._changed = True
+        return self.affected(changed), changed
+
+    def _save(self) -> None:
+        """Write the map through a temporary file, if any module was parsed."""
+        if not self._changed:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._path.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"modules": self._modules, "selected": self.selected}, f)
+        os.replace(tmp_path, self._path)
+        self._changed = False
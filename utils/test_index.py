@@ -0,0 +1,214 @@
+"""Class for a static index of the tests, markers and parameters in test files."""
+
+import ast
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# Path of the cached index
+INDEX_PATH = Path(".playtest") / "test_index.json"
+
+# Markers of pytest, its plugins and Playtest, which are not used to select tests
+BUILTIN_MARKERS = {
+    "batched",
+    "parametrize",
+    "skip",
+    "skipif",
+    "xfail",
+    "usefixtures",
+    "filterwarnings",
+    "flaky",
+    "xdist_group",
+}
+
+
+def _marker(node: ast.expr) -> tuple[str, ast.Call | None] | None:
+    """Get the name and call of a pytest.mark decorator or expression."""
+    call = node if isinstance(node, ast.Call) else None
+    target = call.func if call is not None else node
+    if (
+        isinstance(target, ast.Attribute)
+        and isinstance(target.value, ast.Attribute)
+        and target.value.attr == "mark"
+    ):
+        return target.attr, call
+    return None
+
+
+def _parametrize_count(call: ast.Call | None) -> int | None:
+    """Count the cases of a parametrize marker, or None if it is not a literal."""
+    if call is None or len(call.args) < 2:
+        return None
+    values = call.args[1]
+    if isinstance(values, ast.List | ast.Tuple | ast.Set):
+        return len(values.elts)
+    return None
+
+
+def _markers(nodes: list[ast.expr]) -> tuple[list[str], int | None]:
+    """Get the marker names and the number of parametrized cases of decorators."""
+    names, count = [], 1
+    for node in nodes:
+        marker = _marker(node)
+        if marker is None:
+            continue
+
+        name, call = marker
+        if name == "parametrize":
+            cases = _parametrize_count(call)
+            count = count * cases if count is not None and cases is not None else None
+        else:
+            names.append(name)
+    return names, count
+
+
+def _module_markers(tree: ast.Module) -> list[str]:
+    """Get the markers applied to every test in a module with pytestmark."""
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "pytestmark" for t in node.targets
+        ):
+            value = node.value
+            nodes = value.elts if isinstance(value, ast.List | ast.Tuple) else [value]
+            return _markers(nodes)[0]
+    return []
+
+
+def _test(node: ast.FunctionDef, name: str, markers: list[str]) -> dict:
+    """Get the index entry of a test function."""
+    own_markers, params = _markers(node.decorator_list)
+    return {
+        "name": name,
+        "lineno": node.lineno,
+        "markers": sorted({*markers, *own_markers}),
+        "params": params,
+        "async": isinstance(node, ast.AsyncFunctionDef),
+    }
+
+
+def index_file(path: Path) -> list[dict]:
+    """Parse the test functions and methods of a test file with their markers."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=str(path))
+
+    module_markers = _module_markers(tree)
+    functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+    tests = []
+    for node in tree.body:
+        if isinstance(node, functions) and node.name.startswith("test"):
+            tests.append(_test(node, name=node.name, markers=module_markers))
+
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            # pytest does not collect test classes with an __init__
+            if any(
+                isinstance(n, functions) and n.name == "__init__" for n in node.body
+            ):
+                continue
+
+            class_markers = [*module_markers, *_markers(node.decorator_list)[0]]
+            for method in node.body:
+                if isinstance(method, functions) and method.name.startswith("test"):
+                    tests.append(
+                        _test(
+                            method,
+                            name=f"{node.name}::{method.name}",
+                            markers=class_markers,
+                        )
+                    )
+    return tests
+
+
+class TestIndex:
+    """Index of the tests in a tests directory, parsed statically from the source.
+
+    Each test file is parsed with ast, without importing it, and the index is cached
+    on disk. An update only parses the files added or modified since the last one.
+    The index can be shared between threads: updates are serialised and replace the
+    files as a whole, so readers always see a complete index.
+    """
+
+    # Not a test class, despite its name
+    __test__ = False
+
+    def __init__(self, root: Path = Path("tests"), path: Path = INDEX_PATH) -> None:
+        """Initialise the index of a tests directory, loading the cached index."""
+        self._root = root
+        self._path = path
+        self._files: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path.exists():
+            try:
+                with open(path) as f:
+                    cached = json.load(f)
+                if cached.get("root") == str(root):
+                    self._files = cached["files"]
+            except (OSError, ValueError, KeyError):
+                self._files = {}
+
+    def update(self) -> "TestIndex":
+        """Parse the test files modified since the last update and save the index."""
+        with self._lock:
+            paths = {
+                str(p): p
+                for pattern in ("test_*.py", "*_test.py")
+                for p in self._root.rglob(pattern)
+                if p.is_file()
+            }
+            # Readers keep iterating the current files while the copy is updated
+            files = {key: entry for key, entry in self._files.items() if key in paths}
+            changed = len(files) != len(self._files)
+
+            for key, path in paths.items():
+                mtime = path.stat().st_mtime_ns
+                entry = files.get(key)
+                if entry is not None and entry["mtime"] == mtime:
+                    continue
+
+                try:
+                    tests = index_file(path)
+                except (SyntaxError, ValueError):
+                    tests = []
+                files[key] = {"mtime": mtime, "tests": tests}
+                changed = True
+
+            if changed:
+                self._files = files
+                self._save(files)
+        return self
+
+    def _save(self, files: dict[str, dict]) -> None:
+        """Write the index through a temporary file."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._path.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"root": str(self._root), "files": files}, f)
+        os.replace(tmp_path, self._path)
+
+    def folders(self) -> list[Path]:
+        """List the directories containing test files, relative to the root."""
+        return sorted({Path(key).parent for key in self._files})
+
+    def files(self, folder: Path | None = None) -> list[Path]:
+        """List the test files, optionally only those in a folder."""
+        return sorted(
+            Path(key)
+            for key in self._files
+            if folder is None or Path(key).parent == Path(folder)
+        )
+
+    def tests(self, file: Path) -> list[dict]:
+        """List the tests of a test file."""
+        entry = self._files.get(str(file))
+        return entry["tests"] if entry is not None else []
+
+    def marker_counts(self) -> dict[str, int]:
+        """Count the tests with each marker, excluding pytest's own markers."""
+        counts: dict[str, int] = {}
+        for entry in self._files.values():
+            for test in entry["tests"]:
+                for marker in test["markers"]:
+                    if marker not in BUILTIN_MARKERS:
+                        counts[marker] = counts.get(marker, 0) + (test["params"] or 1)
+        return counts
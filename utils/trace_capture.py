@@ -0,0 +1,97 @@
+"""Class for capturing Playwright traces of selected tests within a disk budget."""
+
+import random
+import re
+import weakref
+from contextlib import suppress
+from pathlib import Path
+
+from playwright.sync_api import Error, Page
+
+MODES = ["off", "on", "on-first-retry", "retain-on-failure", "sampled"]
+
+
+def artifact_name(nodeid: str, attempt: int) -> str:
+    """Get a file name for the artifact of an attempt of a test."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "-", nodeid).strip("-")
+    return f"{name}-rerun{attempt}" if attempt else name
+
+
+class TraceCapture:
+    """Capture of a Playwright trace of each test selected by a capture policy.
+
+    Tracing is started once per browser context and each test is recorded as a
+    trace chunk, so pooled and batched pages are traced per test too. In on mode
+    every test is kept, in on-first-retry mode only the first retry of a failed
+    test is recorded, in retain-on-failure mode every test is recorded and only
+    failures are kept, and in sampled mode a percentage of tests is recorded. The
+    oldest traces are deleted once the traces of the run exceed the disk budget.
+    """
+
+    def __init__(
+        self, mode: str, directory: Path, sample: float = 100, budget: int = 0
+    ) -> None:
+        """Initialise the capture with its mode, directory and budget in bytes."""
+        self.mode = mode
+        self._directory = directory
+        self._sample = sample
+        self._budget = budget
+        self._tracing: weakref.WeakSet = weakref.WeakSet()
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def selects(self, attempt: int) -> bool:
+        """Check if an attempt of a test is recorded, the first attempt being 0."""
+        if self.mode in ("on", "retain-on-failure"):
+            return True
+        if self.mode == "on-first-retry":
+            return attempt == 1
+        if self.mode == "sampled":
+            return random.random() * 100 < self._sample
+        return False
+
+    def start(self, page: Page, title: str) -> bool:
+        """Start recording a test on a page, returning False if it cannot be traced."""
+        context = page.context
+        try:
+            if context not in self._tracing:
+                context.tracing.start(screenshots=True, snapshots=True, sources=True)
+                self._tracing.add(context)
+            context.tracing.start_chunk(title=title)
+        except Error:
+            return False
+        return True
+
+    def stop(self, page: Page, name: str, failed: bool) -> Path | None:
+        """Stop recording a test, returning the path of its trace if it is kept."""
+        tracing = page.context.tracing
+        keep = failed or self.mode != "retain-on-failure"
+        path = self._directory / f"{name}.zip" if keep else None
+        try:
+            tracing.stop_chunk(path=path)
+        except Error:
+            # The page or its context was closed, e.g. after a browser crash
+            return None
+
+        if path is not None:
+            self.evict()
+        return path
+
+    def evict(self) -> None:
+        """Delete the oldest traces until the traces fit in the disk budget."""
+        if not self._budget:
+            return
+
+        traces = []
+        for path in self._directory.glob("*.zip"):
+            with suppress(FileNotFoundError):
+                stat = path.stat()
+                traces.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in traces)
+        for _, size, path in sorted(traces):
+            if total <= self._budget:
+                break
+            # Parallel workers share the directory and may evict the same trace
+            with suppress(FileNotFoundError):
+                path.unlink()
+            total -= size
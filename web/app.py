@@ -1,15 +1,23 @@
 """Main file for running the Streamlit frontend."""
 
+import itertools
 import sys
+import uuid
 from datetime import datetime
 from pathlib import Path
 
 import streamlit as st
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from components import run, run_config, run_type  # noqa: E402
+from components import (  # noqa: E402
+    job_manager,
+    job_view,
+    run,
+    run_config,
+    run_type,
+)
 
-from utils.cli_args import generate_cli_args  # noqa: E402
+from utils.trace_capture import MODES as CAPTURE_MODES  # noqa: E402
 
 
 def btn_callbk() -> None:
@@ -17,6 +25,20 @@ def btn_callbk() -> None:
     st.session_state.disabled = not st.session_state.disabled
 
 
+def make_run_dir(parent: Path) -> Path:
+    """Create the folder of a run, named after the time it started."""
+    name = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+
+    # Runs started by several users in the same second get a numbered suffix
+    for attempt in itertools.count(1):
+        path = parent / (name if attempt == 1 else f"{name}_{attempt}")
+        try:
+            path.mkdir(parents=True)
+            return path
+        except FileExistsError:
+            continue
+
+
 if __name__ == "__main__":
     st.set_page_config(
         page_title="Playtest",
@@ -30,6 +52,10 @@ if __name__ == "__main__":
     if "disabled" not in st.session_state:
         st.session_state.disabled = False
 
+    # Identify the session so queued runs are shared fairly between sessions
+    if "owner" not in st.session_state:
+        st.session_state.owner = uuid.uuid4().hex
+
     with st.sidebar:
         with st.expander(label="Config options", expanded=True):
             # Option to select if report is generated
@@ -40,10 +66,20 @@ if __name__ == "__main__":
                 disabled=st.session_state.disabled,
             )
 
-            # Option to select if a Playwright trace is generated
-            tracing = st.checkbox(
-                label="Tracing",
-                help="Generate a playwright trace for each test. See https://playwright.dev/python/docs/trace-viewer-intro",
+            # Option to select which tests a Playwright trace is kept for
+            capture = st.selectbox(
+                label="Trace capture",
+                options=CAPTURE_MODES,
+                help="Keep a playwright trace of every test, the first retry of "
+                "failed tests, failed tests or a sample of tests. See https://playwright.dev/python/docs/trace-viewer-intro",
+                disabled=st.session_state.disabled,
+            )
+
+            # Option to record the resource use and timings of each test
+            instrument = st.checkbox(
+                label="Instrumentation",
+                help="Record wall and cpu time, fixture and body time, peak memory "
+                "and page load timings of each test in the report",
                 disabled=st.session_state.disabled,
             )
 
@@ -69,6 +105,12 @@ if __name__ == "__main__":
                 help="Select number of times to rerun failed tests",
                 disabled=st.session_state.disabled,
             )
+            smart_retry = st.checkbox(
+                label="Smart retries",
+                help="Only rerun timeouts, navigation, network and browser errors, "
+                "with a growing delay and a limit on the retries of a run",
+                disabled=st.session_state.disabled,
+            )
 
         # Select type of test run and associated options
         run_options = run_type(session_state=st.session_state)
@@ -90,26 +132,44 @@ if __name__ == "__main__":
         config = run_config(
             parallel=parallel,
             headed=headed,
-            playtest_report=playtest_report,
+            playtest_report=True,
             markers=run_options.get("marks"),
             test_dir=run_options["test_folder"],
             test_file=run_options["test_file"],
             test_case=run_options["test_case"],
-            tracing=tracing,
+            test_nodeids=run_options.get("test_nodeids"),
+            failure_first=run_options.get("failure_first", False),
+            maxfail=run_options.get("maxfail", 0),
+            capture=capture,
             rerun=rerun,
+            retry_policy="smart" if smart_retry else "all",
+            instrument=instrument,
+            playtest_report_mode="stream",
         )
 
-        now = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-
-        path = Path.cwd() / "reports" / now
-
-        # Create the report subdirectory only if either option is selected
-        if playtest_report or tracing:
-            path.mkdir()
-
-        cli_args = generate_cli_args(config=config, path=str(path))
+        # The results are streamed from the report, which is only kept if selected
+        if playtest_report or capture != "off":
+            path = make_run_dir(parent=Path.cwd() / "reports")
+        else:
+            path = make_run_dir(parent=Path.cwd() / ".playtest" / "runs")
+            config["playtest-report-json"] = False
+            config["playtest-report-table"] = False
+            config["playtest-report-catalog"] = False
+
+        st.session_state.job_id = run(
+            config=config, report_path=path, owner=st.session_state.owner
+        )
 
-        while True:
-            run_playtest = run(cli_args=cli_args)
-            if run_playtest is not None:
-                break
+    # Watch the run of this session, or any other run on the server
+    jobs = job_manager().jobs()
+    if jobs:
+        job_ids = [job.id for job in jobs]
+        statuses = {job.id: job.status for job in jobs}
+        current = st.session_state.get("job_id")
+        job_id = st.selectbox(
+            label="Test run",
+            options=job_ids,
+            index=job_ids.index(current) if current in job_ids else 0,
+            format_func=lambda i: f"{i} ({statuses[i]})",
+        )
+        job_view(job_id=job_id)
@@ -1,13 +1,25 @@
 """Functions and streamlit components for use in the Streamlit frontend."""
 
-import subprocess
+import time
 from enum import Enum
+from pathlib import Path
 
 import streamlit as st
 from streamlit.runtime.state import SessionStateProxy
 
-from utils.list_paths import list_test_cases, list_test_files, list_test_folders
+from plugins.report_stream import NdjsonTail
+from utils.cli_args import last_failed
+from utils.job_manager import JobManager
 from utils.load_markers import load_pytest_markers
+from utils.report_model import ReportIndex
+from utils.test_impact import DependencyMap
+from utils.test_index import TestIndex
+
+# Maximum number of events read from a job's stream in each update of the UI
+EVENT_BATCH_SIZE = 1000
+
+# Seconds between the reruns of the app polling a running job
+POLL_INTERVAL = 1
 
 
 class RunType(str, Enum):
@@ -18,10 +30,25 @@ class RunType(str, Enum):
     File = "By test file"
     TestCase = "By test case"
     Markers = "By marks"
+    Affected = "Affected by changes"
+    LastFailed = "Last failed"
+    FailureFirst = "Failures first"
+
+
+@st.cache_resource
+def load_test_index() -> TestIndex:
+    """Load the cached test index, kept in memory between reruns."""
+    return TestIndex()
+
+
+def test_index() -> TestIndex:
+    """Get the test index, parsing only the test files changed since the last rerun."""
+    return load_test_index().update()
 
 
 def run_type(session_state: SessionStateProxy) -> dict:
     """Display streamlit component for selecting a run type and set relevant values."""
+    index = test_index()
     run_option = st.radio(
         label="Run type",
         options=[r.value for r in RunType],
@@ -29,7 +56,7 @@ def run_type(session_state: SessionStateProxy) -> dict:
     )
 
     if run_option == RunType.Markers:
-        marks = markers(session_state=session_state)
+        marks = markers(session_state=session_state, index=index)
         options = {
             "marks": marks,
             "test_folder": None,
@@ -40,7 +67,7 @@ def run_type(session_state: SessionStateProxy) -> dict:
     elif run_option == RunType.Folder:
         test_folder = st.selectbox(
             label="Test folder",
-            options=list_test_folders(),
+            options=index.folders(),
             disabled=session_state.disabled,
         )
 
@@ -54,12 +81,12 @@ def run_type(session_state: SessionStateProxy) -> dict:
     elif run_option == RunType.File:
         test_folder = st.selectbox(
             label="test folders",
-            options=list_test_folders(),
+            options=index.folders(),
             disabled=session_state.disabled,
         )
         test_file = st.selectbox(
             label="test file",
-            options=list_test_files(test_folder),
+            options=index.files(test_folder),
             disabled=session_state.disabled,
         )
 
@@ -73,17 +100,19 @@ def run_type(session_state: SessionStateProxy) -> dict:
     elif run_option == RunType.TestCase:
         test_folder = st.selectbox(
             label="test folders",
-            options=list_test_folders(),
+            options=index.folders(),
             disabled=session_state.disabled,
         )
         test_file = st.selectbox(
             label="test file",
-            options=list_test_files(test_folder),
+            options=index.files(test_folder),
             disabled=session_state.disabled,
         )
+        tests = {test["name"]: test for test in index.tests(test_file)}
         test_case = st.selectbox(
             label="test case",
-            options=list_test_cases(test_file),
+            options=list(tests),
+            format_func=lambda name: format_test_case(tests[name]),
             disabled=session_state.disabled,
         )
         formatted_test_case = f"{str(test_file)}::{str(test_case)}"
@@ -94,6 +123,60 @@ def run_type(session_state: SessionStateProxy) -> dict:
             "test_case": formatted_test_case,
         }
 
+    elif run_option == RunType.Affected:
+        base = st.text_input(
+            label="Changed since",
+            value="HEAD",
+            help="Git revision to compare with, e.g. HEAD for uncommitted changes",
+            disabled=session_state.disabled,
+        )
+        # The selection is shown on every rerun, so it is not recorded
+        nodeids, changed = DependencyMap().select(base=base, record=False)
+        st.caption(f"{len(nodeids)} tests affected by {len(changed)} changed files")
+        with st.expander("Affected tests"):
+            st.write(nodeids)
+
+        options = {
+            "marks": None,
+            "test_folder": None,
+            "test_file": None,
+            "test_case": None,
+            "test_nodeids": nodeids,
+        }
+
+    elif run_option == RunType.LastFailed:
+        runs = st.number_input(
+            label="Recent reports",
+            min_value=1,
+            max_value=50,
+            value=5,
+            help="Run the tests that failed or were rerun in this many recent reports",
+            disabled=session_state.disabled,
+        )
+        nodeids = last_failed(reports_dir=Path.cwd() / "reports", runs=runs)
+        st.caption(f"{len(nodeids)} tests failed or were rerun")
+        with st.expander("Failed tests"):
+            st.write(nodeids)
+
+        options = {
+            "marks": None,
+            "test_folder": None,
+            "test_file": None,
+            "test_case": None,
+            "test_nodeids": nodeids,
+            "maxfail": max_failures(session_state=session_state),
+        }
+
+    elif run_option == RunType.FailureFirst:
+        options = {
+            "marks": None,
+            "test_folder": None,
+            "test_file": None,
+            "test_case": None,
+            "failure_first": True,
+            "maxfail": max_failures(session_state=session_state),
+        }
+
     else:
         options = {
             "marks": None,
@@ -105,14 +188,37 @@ def run_type(session_state: SessionStateProxy) -> dict:
     return options
 
 
-def markers(session_state: SessionStateProxy) -> list[str | None]:
+def max_failures(session_state: SessionStateProxy) -> int:
+    """Display streamlit component for stopping a run after a number of failures."""
+    return st.number_input(
+        label="Stop after failures",
+        min_value=0,
+        value=1,
+        help="Stop the run after this many failed tests, 0 to run every test",
+        disabled=session_state.disabled,
+    )
+
+
+def format_test_case(test: dict) -> str:
+    """Format a test case from the test index with its number of cases."""
+    if test["params"] is None:
+        return f"{test['name']} (parametrized)"
+    if test["params"] > 1:
+        return f"{test['name']} ({test['params']} cases)"
+    return test["name"]
+
+
+def markers(session_state: SessionStateProxy, index: TestIndex) -> list[str | None]:
     """Load pytest marks, display them in streamlit and return the selected markers."""
-    # Parse markers from the pyproject.toml file
+    # Parse markers from the pyproject.toml file, followed by any others in the tests
+    counts = index.marker_counts()
     all_marks = load_pytest_markers()
+    all_marks += sorted(set(counts) - set(all_marks))
     # Display multi select widget with list of markers
     markers = st.multiselect(
         label="Markers",
         options=all_marks,
+        format_func=lambda mark: f"{mark} ({counts.get(mark, 0)} tests)",
         help="Select to run tests with the chosen markers",
         disabled=session_state.disabled,
     )
@@ -128,83 +234,130 @@ def run_config(
     test_dir: str = None,
     test_file: str = None,
     test_case: str = None,
+    test_nodeids: list[str] | None = None,
+    failure_first: bool = False,
+    maxfail: int = 0,
     tracing: bool = False,
+    capture: str = "off",
     rerun: int = 0,
+    retry_policy: str = "all",
+    playtest_report_mode: str = "json",
+    instrument: bool = False,
 ) -> dict:
     """Generate Playtest config to pass to the run command."""
     config = {
         "headed": headed,
         "verbose": True,
         "parallel": parallel,
+        "schedule": "duration" if parallel else "default",
         "playtest-report": playtest_report,
+        "playtest-report-mode": playtest_report_mode,
+        "playtest-report-json": True,
+        # A streamed report is tailed live, so every event goes through the controller
+        "playtest-report-shards": parallel and playtest_report_mode != "stream",
+        "playtest-report-flush": 1 if playtest_report_mode == "stream" else None,
+        "playtest-report-table": True,
+        "playtest-report-instrument": instrument,
         "marks": markers,
         "test_dir": test_dir,
         "test_file": test_file,
         "test_case": test_case,
+        "test_nodeids": test_nodeids,
+        "failure-first": failure_first,
+        "maxfail": maxfail,
         "rerun": rerun,
+        "retry-policy": retry_policy,
+        "retry-delay": 1,
+        "retry-budget": 10,
+        "context-pool": 0,
+        "storage-state-ttl": 0,
+        "network-mode": "off",
+        "network-block-types": None,
+        "network-block-domains": None,
+        "async-concurrency": 0,
+        "capture": capture,
+        "capture-sample": 10,
+        "capture-budget": 500,
         "tracing": tracing,
     }
     return config
 
 
-def run(cli_args: list) -> int:
-    """Entry point for running pytest from Streamlit."""
-    args = ["python", "-m", "pytest"]
-    args.extend(cli_args)
-
-    st.write(args)
-
-    # Create expanders to contain different pytest output
-    expander_metadata = st.expander("Test Run Metadata")
-    expander_results = st.expander("Test Results", expanded=True)
-    expander_failures = st.expander("Test Failures")
-
-    with st.spinner("Running tests..."):
-        process = subprocess.Popen(args=args, stdout=subprocess.PIPE)
-        while True:
-            output = process.stdout.readline().decode().strip()
-            if output == "" and process.poll() is not None:
-                st.success("Test Run Complete")
-                break
-
-            else:
-                if output.startswith(
-                    (
-                        "==",
-                        "platform",
-                        "cachedir",
-                        "rootdir",
-                        "configfile",
-                        "plugins",
-                        "collecting",
-                        "- generated Playtest report file",
-                    )
-                ):
-                    if any(
-                        substring in output
-                        for substring in ["FAILURES", "short test summary info"]
-                    ):
-                        with expander_failures:
-                            st.write(output)
-                    else:
-                        with expander_metadata:
-                            st.write(output)
-
-                elif output.startswith(("tests", "[g")) and "PASSED" in output:
-                    with expander_results:
-                        st.success(output)
-
-                elif output.startswith(("tests", "[g")) and "FAILED" in output:
-                    with expander_results:
-                        st.error(output)
-
-                elif output.startswith(("tests", "[g")) and "RERUN" in output:
-                    with expander_results:
-                        st.warning(output)
-
-                else:
-                    with expander_failures:
-                        st.text(output)
-
-    return_code = process.poll()
-    return return_code
+@st.cache_resource
+def job_manager() -> JobManager:
+    """Get the job manager shared by every Streamlit session."""
+    return JobManager()
+
+
+def run(config: dict, report_path: Path, owner: str) -> str:
+    """Queue a Playtest run of a config as a background job and return its id."""
+    job = job_manager().submit(config=config, report_path=report_path, owner=owner)
+    return job.id
+
+
+def job_view(job_id: str) -> None:
+    """Display a job's live results, polling its event stream while it runs."""
+    job = job_manager().get(job_id)
+    if job is None:
+        st.warning("Test run not found, it may have been run by an earlier server")
+        return
+
+    job_results(job_id=job_id)
+
+    # A running job is polled by rerunning the whole app, so it is displayed last
+    if not job.done:
+        time.sleep(POLL_INTERVAL)
+        st.experimental_rerun()
+
+
+def job_results(job_id: str) -> None:
+    """Display the results of a job read from its event stream since the last poll."""
+    job = job_manager().get(job_id)
+
+    # Each session keeps its own position in the stream and index of the results
+    key = f"job_{job_id}"
+    if key not in st.session_state:
+        st.session_state[key] = (NdjsonTail(path=job.events), ReportIndex())
+    tail, index = st.session_state[key]
+
+    # Read running jobs in batches so a large backlog never stalls the UI
+    events = tail.read(limit=None if job.done else EVENT_BATCH_SIZE)
+    for event in events:
+        if event.get("$report_type") == "TestReport":
+            index.add_report(event)
+
+    st.write(" ".join(job.args[3:]))
+    if job.status == "finished":
+        st.success("Test Run Complete")
+    elif job.status == "failed":
+        st.error(f"Test Run Failed, exit code {job.returncode}")
+    elif job.done:
+        st.warning(f"Test Run {job.status.capitalize()}")
+    else:
+        st.info(f"Test Run {job.status.capitalize()}...")
+        st.button(
+            label="Cancel",
+            key=f"cancel_{job_id}",
+            on_click=job_manager().cancel,
+            kwargs={"job_id": job_id},
+        )
+
+    # Display the outcome totals and results of the tests seen so far
+    cols = st.columns(3)
+    cols[0].metric(label="Passed", value=index.counts["passed"])
+    cols[1].metric(label="Failed", value=index.counts["failed"])
+    cols[2].metric(label="Reruns", value=index.counts["rerun"])
+
+    with st.expander("Test Results", expanded=True):
+        st.dataframe(data=index.results(), use_container_width=True)
+
+    with st.expander("Test Failures"):
+        for failure in index.failures:
+            reason = ", ".join(
+                filter(None, [failure["outcome"], failure.get("failure_class")])
+            )
+            st.error(f"{failure['nodeid']} ({reason})")
+            st.text(failure["message"])
+
+    with st.expander("Test Run Output"):
+        st.code("\n".join(job.output()))
@@ -0,0 +1,83 @@
+"""Streamlit page for analysing test flakiness and durations across reports."""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+import streamlit as st  # noqa: E402
+
+from utils.report_catalog import open_report_catalog  # noqa: E402
+from utils.report_history import (  # noqa: E402
+    HISTORY_FILE,
+    test_statistics,
+    update_history,
+)
+
+
+def catalog_runs(runs: int) -> list[dict]:
+    """List the most recent catalogued runs."""
+    with open_report_catalog(reports_dir=Path.cwd() / "reports") as catalog:
+        return catalog.latest_runs(limit=runs)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_statistics(latest_runs: list[dict]) -> pd.DataFrame:
+    """Update the history with new runs and get the statistics of the runs."""
+    history_path = Path.cwd() / "reports" / HISTORY_FILE
+    history = update_history(history_path=history_path, runs=latest_runs)
+    return test_statistics(history=history, runs=latest_runs)
+
+
+st.set_page_config(
+    page_title="Analytics",
+    page_icon="random",
+    layout="wide",
+)
+
+st.title(body="Analytics")
+
+with st.sidebar:
+    # Select the number of most recent runs to analyse
+    runs = st.number_input(
+        label="Number of runs",
+        min_value=1,
+        max_value=500,
+        value=20,
+        help="Analyse the most recent runs recorded in the report catalog",
+    )
+
+# The statistics are cached by the runs, so they are refreshed when a new run finishes
+latest_runs = catalog_runs(runs=runs)
+stats_df = load_statistics(latest_runs=latest_runs)
+run_count = len(latest_runs)
+
+if stats_df.empty:
+    st.info(body="No reports have been recorded in the report catalog yet.", icon="ℹ️")
+
+else:
+    st.info(body=f"Analysed {len(stats_df)} tests across {run_count} runs.", icon="🧮")
+
+    flaky_tab, slow_tab, all_tab = st.tabs(["Flakiest", "Slowest", "All Tests"])
+
+    with flaky_tab:
+        # Tests that failed or needed a rerun in any of the runs
+        flaky_df = stats_df[(stats_df["pass_rate"] < 1) | (stats_df["rerun_rate"] > 0)]
+        flaky_df = flaky_df.sort_values(
+            by=["pass_rate", "rerun_rate"], ascending=[True, False]
+        )
+        st.bar_chart(data=flaky_df.head(20), x="Test Case", y="rerun_rate")
+        st.dataframe(data=flaky_df, use_container_width=True)
+
+    with slow_tab:
+        slow_df = stats_df.sort_values(by="total p95", ascending=False)
+        st.bar_chart(
+            data=slow_df.head(20),
+            x="Test Case",
+            y=["setup p95", "call p95", "teardown p95"],
+        )
+        st.dataframe(data=slow_df, use_container_width=True)
+
+    with all_tab:
+        st.dataframe(data=stats_df, use_container_width=True)
@@ -6,12 +6,40 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import json  # noqa: E402
+from datetime import date  # noqa: E402
 
 import pandas as pd  # noqa: E402
 import streamlit as st  # noqa: E402
 from pandas.io.formats.style import Styler  # noqa: E402
 
-from utils.list_paths import list_json_report_files  # noqa: E402
+from utils.report_catalog import open_report_catalog  # noqa: E402
+from utils.report_model import ReportIndex, failure_lines  # noqa: E402
+from utils.report_table import (  # noqa: E402
+    SUMMARY_FILE,
+    artifact_records,
+    failure_records,
+    instrumentation_frame,
+    outcome_counts,
+    read_summary_table,
+    results_frame,
+)
+
+# Number of reports and derived views kept in the cache before evicting the oldest
+REPORT_CACHE_SIZE = 8
+
+# Column names of the instrumentation measurements shown on the page
+INSTRUMENTATION_LABELS = {
+    "wall_time": "Wall Time (s)",
+    "cpu_time": "CPU Time (s)",
+    "wait_time": "Waiting Time (s)",
+    "fixture_time": "Fixture Time (s)",
+    "body_time": "Body Time (s)",
+    "peak_rss": "Process Peak RSS (MB)",
+    "page_load": "Page Load (s)",
+    "dom_content_loaded": "DOMContentLoaded (s)",
+    "requests": "Requests",
+    "transfer_bytes": "Transferred (KB)",
+}
 
 
 def path_parent(path: Path) -> str:
@@ -20,110 +48,161 @@ def path_parent(path: Path) -> str:
     return parent.stem
 
 
+def file_key(file: Path) -> tuple[str, float, int]:
+    """Get the path, modification time and size used to key a cached report."""
+    stat = file.stat()
+    return str(file), stat.st_mtime, stat.st_size
+
+
+def catalog_report_files(start: date, end: date, rebuild: bool) -> list[Path]:
+    """List the json report files of the catalogued runs between two dates."""
+    reports_dir = Path.cwd() / "reports"
+    with open_report_catalog(reports_dir=reports_dir, rebuild=rebuild) as catalog:
+        runs = catalog.list_runs(start=start, end=end)
+
+    return [Path(run["path"]) / "playtest_report.json" for run in runs]
+
+
+def warn_missing_report(file: Path) -> None:
+    """Warn that a report file was deleted or moved after it was listed."""
+    st.warning(body=f"Report file: {file} does not exist.", icon="⚠️")
+
+
+@st.cache_resource(max_entries=REPORT_CACHE_SIZE, show_spinner=False)
+def read_json_report(path: str, mtime: float, size: int) -> dict:
+    """Read a json report, cached by its path, modification time and size."""
+    # Cached as a shared resource so a large report is not copied on every rerun
+    with open(path) as f:
+        return json.load(f)
+
+
 def load_json_report(file: Path) -> dict:
     """Load a json report."""
     try:
-        with open(report_path) as f:
-            data = json.load(f)
-            return data
+        return read_json_report(*file_key(file))
     except FileNotFoundError:
         err = f"Report file: {file} does not exist."
         print(err)
 
 
-def get_unique_tests(data: dict) -> tuple[str]:
-    """Get all unique node ids from json report."""
-    return tuple(set([x["nodeid"] for x in data]))
+@st.cache_data(max_entries=REPORT_CACHE_SIZE, show_spinner=False)
+def json_report_view(path: str, mtime: float, size: int) -> dict:
+    """Index a json report into its metadata, counts, results and failures."""
+    data = read_json_report(path, mtime, size)
+
+    # Index the test reports by node id and phase in a single pass
+    index = ReportIndex.from_test_data(test_data=data.get("test_data"))
+
+    return {
+        "metadata": data.get("metadata"),
+        "counts": index.counts,
+        "results": pd.DataFrame(data=index.results()),
+        "failures": index.failures,
+        "instrumentation": pd.DataFrame(data=index.instrumentation()),
+        "artifacts": index.artifacts,
+    }
+
 
+@st.cache_data(max_entries=REPORT_CACHE_SIZE, show_spinner=False)
+def summary_report_view(path: str, mtime: float, size: int) -> dict:
+    """Read a summary table into its metadata, counts, results and failures."""
+    summary_df, metadata = read_summary_table(path=Path(path))
 
-def get_total_duration(data: dict) -> float:
-    """Get total duration from json report."""
+    return {
+        "metadata": metadata,
+        "counts": outcome_counts(df=summary_df),
+        "results": results_frame(df=summary_df),
+        "failures": failure_records(df=summary_df),
+        "instrumentation": instrumentation_frame(df=summary_df),
+        "artifacts": artifact_records(df=summary_df),
+    }
+
+
+def get_total_duration(metadata: list) -> float:
+    """Get total duration from the report metadata."""
     # Get total duration from the metadata object
-    metadata = data.get("metadata")
     duration = metadata[1].get("total_duration")
     return duration
 
 
-def get_results_count(data: dict) -> int:
-    """Get the number of tests passed and failed from the json report."""
-    # Identify the test data object
-    test_data = data.get("test_data")
-
-    # Initialise counters
-    passed_count = 0
-    failed_count = 0
-    rerun_count = 0
-
-    # Get number of passed outcomes and increment counter
-    for test in test_data:
-        if test["when"] == "call":
-            if test["outcome"] == "passed":
-                passed_count += 1
-            elif test["outcome"] == "failed":
-                failed_count += 1
-            elif test["outcome"] == "rerun":
-                rerun_count += 1
-
-    return passed_count, failed_count, rerun_count
-
-
-def parse_test_results(data: dict, test_cases: tuple[str]) -> list[dict]:
-    """Parse the json report for results to pass into a dataframe."""
-    # Identify the test data object
-    test_data = data.get("test_data")
-
-    # Initialise empty results list
-    results = []
-
-    # Get each object for each unique nodeid
-    for test in test_cases:
-        test_results = {"Test Case": test}
-        test_objects = [x for x in test_data if x["nodeid"] == test]
-        for test_object in test_objects:
-            if test_object["when"] == "call":
-                outcome = test_object["outcome"]
-                call_duration = test_object["duration"]
-            elif test_object["when"] == "setup":
-                setup_duration = test_object["duration"]
-
-            elif test_object["when"] == "teardown":
-                teardown_duration = test_object["duration"]
-
-        total_duration = call_duration + setup_duration + teardown_duration
-        test_results.update(
-            {
-                "Outcome": outcome,
-                "Setup Duration": setup_duration,
-                "Call Duration": call_duration,
-                "Teardown Duration": teardown_duration,
-                "Total Duration": total_duration,
-            }
+def display_test_failures(failures: list[dict]) -> None:
+    """Display test failure information from the report index."""
+    for failure in failures:
+        # Without the json report only the crash message is available
+        if failure["longrepr"] is None:
+            error_message_str = failure["message"]
+        else:
+            error_message_str = "\n".join(failure_lines(failure["longrepr"]))
+        with st.expander(label=f":red[{failure['nodeid']}]"):
+            st.subheader("Path:")
+            st.text(failure["path"])
+            st.subheader("Line Number:")
+            st.text(failure["lineno"])
+            st.subheader("Error Message:")
+            st.text(error_message_str)
+            # Reports written before failures were classified have no class
+            if failure.get("failure_class"):
+                st.subheader("Failure Class:")
+                st.text(failure["failure_class"])
+
+
+def display_artifacts(artifacts: list[dict]) -> None:
+    """Display the traces captured for each test with a link to download them."""
+    if not artifacts:
+        st.info(
+            body="No artifacts captured, enable them with the capture config option",
+            icon="ℹ️",
         )
+        return
+
+    for index, artifact in enumerate(artifacts):
+        path = Path(artifact["path"])
+        label = artifact["nodeid"]
+        if artifact["rerun"]:
+            label += f" (rerun {artifact['rerun']})"
+
+        with st.expander(label=label):
+            # The oldest traces of a run are deleted once it exceeds its disk budget
+            if not path.exists():
+                st.warning(f"{path} was evicted by the disk budget")
+                continue
+            st.download_button(
+                label="Download trace",
+                data=path.read_bytes(),
+                file_name=path.name,
+                mime="application/zip",
+                key=f"artifact_{index}",
+            )
+            st.code(f"playwright show-trace {path}", language="bash")
+
+
+def display_instrumentation(instrumentation_df: pd.DataFrame) -> None:
+    """Display the instrumentation of each test and where its time was spent."""
+    if instrumentation_df.empty:
+        st.info(
+            body="No instrumentation recorded, enable it with the "
+            "playtest-report-instrument config option",
+            icon="ℹ️",
+        )
+        return
 
-        results.append(test_results)
-
-    return results
+    df = instrumentation_df.set_index("Test Case").astype(float)
 
+    # Time the Python process was not using the cpu was spent waiting on the browser
+    df["wait_time"] = (df["wall_time"] - df["cpu_time"]).clip(lower=0)
+    df["peak_rss"] = df["peak_rss"] / 1024**2
+    df["transfer_bytes"] = df["transfer_bytes"] / 1024
 
-def display_test_failures(data: dict) -> None:
-    """Parse and display test failure information from json report."""
-    # Identify the test data object
-    test_data = data.get("test_data")
+    # Split the wall time of the slowest tests into Python and browser time
+    slowest = df.nlargest(n=20, columns="wall_time")
+    st.bar_chart(
+        data=slowest[["cpu_time", "wait_time"]].rename(columns=INSTRUMENTATION_LABELS)
+    )
 
-    # Get failed test report objects
-    for test in test_data:
-        if test["when"] == "call" and test["outcome"] != "passed":
-            error_message = test["longrepr"]["reprtraceback"]["reprentries"][0]["data"][
-                "lines"
-            ]
-            error_message_str = "\n".join([str(line) for line in error_message])
-            with st.expander(label=f":red[{test['nodeid']}]"):
-                st.subheader("Path:")
-                st.text(test["longrepr"]["reprcrash"]["path"])
-                st.subheader("Line Number:")
-                st.text(test["longrepr"]["reprcrash"]["lineno"])
-                st.subheader("Error Message:")
-                st.text(error_message_str)
+    st.dataframe(
+        data=df[list(INSTRUMENTATION_LABELS)].rename(columns=INSTRUMENTATION_LABELS),
+        use_container_width=True,
+    )
 
 
 def highlight_rows(row: pd.DataFrame) -> list[str]:
@@ -152,10 +231,9 @@ def style_report_dataframe(df: Styler) -> Styler:
     return df
 
 
-def display_test_summary(data: dict) -> None:
-    """Parse the json report and display a test summary."""
-    # Get the list of pytest cli args from the json report
-    metadata: dict = data.get("metadata")
+def display_test_summary(metadata: list) -> None:
+    """Parse the report metadata and display a test summary."""
+    # Get the list of pytest cli args from the report metadata
     metadata_args: list = metadata[0]["args"]
 
     # filter through headed option as it affects list indices
@@ -212,40 +290,75 @@ st.set_page_config(
 st.title(body="Reports")
 
 with st.sidebar:
-    # Select a date to filter selectable test reports
-    selected_date = st.date_input(label="Select a date").strftime("%d-%m-%Y")
+    # Select a date range to filter selectable test reports
+    today = date.today()
+    selected_dates = st.date_input(label="Select a date range", value=(today, today))
+
+    # The range only has a start date while the end date is being picked
+    start_date, end_date = (
+        selected_dates if len(selected_dates) == 2 else (selected_dates[0],) * 2
+    )
+
+    # Add reports missing from the catalog, e.g. of runs made without recording them
+    rebuild = st.button(
+        label="Rebuild catalog",
+        help="Add reports in the reports folder that are missing from the catalog",
+    )
 
     # Select a json report, formatted to show only parent folder
     report_path = st.selectbox(
         label="Available reports",
-        options=list_json_report_files(date=selected_date),
+        options=catalog_report_files(start=start_date, end=end_date, rebuild=rebuild),
         format_func=path_parent,
     )
 
     view_report = st.button(label="View Report", type="primary")
 
-if report_path is not None and view_report:
-    # Load json report into a dict
-    data = load_json_report(file=report_path)
+# Keep showing the viewed report when other widgets cause a rerun
+if view_report:
+    st.session_state.report_path = report_path
+report_path = st.session_state.get("report_path")
+
+if report_path is not None:
+    data = None
+    summary_path = report_path.parent / SUMMARY_FILE
 
-    # Get the test data object from the report
-    test_data = data.get("test_data")
+    # Reports and their derived views are cached by path, modification time and size
+    try:
+        if summary_path.exists():
+            # Load the columnar summary table, which is much faster than the json
+            view = summary_report_view(*file_key(summary_path))
+
+        else:
+            # Load json report into a dict
+            data = load_json_report(file=report_path)
+            view = json_report_view(*file_key(report_path))
+    except FileNotFoundError:
+        # The report was deleted since it was selected
+        warn_missing_report(file=report_path)
+        st.stop()
 
-    # Get all unique node ids from the test cases
-    test_cases = get_unique_tests(test_data)
+    metadata = view["metadata"]
+    counts = view["counts"]
+    results_df = view["results"]
+    failures = view["failures"]
 
     # Get count of passed, failed and rerun test results
-    passed_count, failed_count, rerun_count = get_results_count(data=data)
+    passed_count = counts["passed"]
+    failed_count = counts["failed"]
+    rerun_count = counts["rerun"]
 
     # Tabs for separating test run information
-    summary_tab, report_tab, raw_data_tab = st.tabs(["Summary", "Report", "Raw Output"])
+    summary_tab, report_tab, instrumentation_tab, artifacts_tab, raw_data_tab = st.tabs(
+        ["Summary", "Report", "Instrumentation", "Artifacts", "Raw Output"]
+    )
 
     with summary_tab:
         # Display test run summary
         st.subheader(body="Test Run Summary")
 
         # Display how the tests were run i.e. by folder, file, test case, markers
-        display_test_summary(data=data)
+        display_test_summary(metadata=metadata)
 
     with report_tab:
         st.subheader(body="Test Run Report")
@@ -256,11 +369,14 @@ if report_path is not None and view_report:
 
         # Display the total test run duration
         with info_col1:
-            st.info(body=f"Total duration: {get_total_duration(data=data)}s", icon="⏰")
+            st.info(
+                body=f"Total duration: {get_total_duration(metadata=metadata)}s",
+                icon="⏰",
+            )
 
         # Display total number of tests
         with info_col2:
-            st.info(body=f"Number of tests: {len(test_cases)}", icon="🧮")
+            st.info(body=f"Number of tests: {len(results_df)}", icon="🧮")
 
         # Display number of tests passed
         with info_col3:
@@ -274,11 +390,6 @@ if report_path is not None and view_report:
         with info_col5:
             st.warning(body=f"Rerun: {rerun_count}", icon="🏃‍♂️")
 
-        # Create a dataframe of the test results, with styling for failed tests
-        results_df = pd.DataFrame(
-            data=parse_test_results(data=data, test_cases=test_cases)
-        )
-
         # Display a streamlit dataframe widget with styling applied
         st.dataframe(
             data=results_df.style.pipe(style_report_dataframe),
@@ -288,8 +399,32 @@ if report_path is not None and view_report:
         # Display expanders with data for each failed test
         st.subheader(body="Failed tests")
 
-        display_test_failures(data=data)
+        # Tracebacks are only stored in the json report, so load it on request
+        if data is None and failures and st.checkbox(label="Show tracebacks"):
+            try:
+                failures = json_report_view(*file_key(report_path))["failures"]
+                data = load_json_report(file=report_path)
+            except FileNotFoundError:
+                warn_missing_report(file=report_path)
+
+        display_test_failures(failures=failures)
+
+    with instrumentation_tab:
+        st.subheader(body="Test Instrumentation")
+
+        # Tell apart time spent in fixtures, in Python and waiting on the browser
+        display_instrumentation(instrumentation_df=view["instrumentation"])
+
+    with artifacts_tab:
+        st.subheader(body="Test Artifacts")
+
+        # Traces kept by the capture policy, linked from the report
+        display_artifacts(artifacts=view["artifacts"])
 
     with raw_data_tab:
+        if data is None and st.checkbox(label="Load raw json report"):
+            data = load_json_report(file=report_path)
+
         # Display the raw json
-        st.json(data)
+        if data is not None:
+            st.json(data)